@@ -1,13 +1,32 @@
+import base64
 import hashlib
+import hmac
 import os
+import sqlite3
+import sys
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 
-import jwt
+# Prefer the Rust-backed PyJWT drop-in when available - same API, faster
+# HS256 encode/decode - and fall back to plain PyJWT otherwise.
+try:
+    import jwt_rs as jwt
+except ImportError:
+    import jwt
+
+import orjson
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError
 from dotenv import load_dotenv
 from fastapi import HTTPException, status
 
+# Warm up OpenSSL's EVP digest path once at import so cpuid feature detection
+# (SHA-NI etc.) runs before the first real hash on the login path.
+_ = hashlib.sha256(b"").digest()
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -20,8 +39,22 @@ if not JWT_SECRET_KEY:
     )
 JWT_ALGORITHM = "HS256"
 
+# Precomputed pieces for token signing: the header never changes, and copying
+# a keyed HMAC object skips the per-call ipad/opad key schedule.
+_JWT_HEADER_B64 = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+_JWT_MAC_TEMPLATE = hmac.new(JWT_SECRET_KEY.encode(), digestmod="sha256")
+
+# Password hasher tuned for ~tens of ms per verify; the heavy lifting runs in
+# the argon2 C library, so the attacker's cost goes up without adding Python
+# overhead on the login path.
+PH = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
+
+# Hashes produced by `hash_password` start with this; anything else is a
+# legacy unsalted SHA-256 hex digest awaiting lazy migration.
+ARGON2_PREFIX = "$argon2id$"
+
 # User database - in production, this should be in a proper database
-# Format: username -> hashed_password
+# Format: username -> hashed_password (argon2id string, or legacy SHA-256 hex)
 USERS = {
     "Amit": "b722a33500f5e30af6d70a0010aff2ee1282b7e25a1616064bd14716e890512e",  # Will be set when password is provided
     "Tal": "995be2de94d944ace0ad0bfeae6dcbb2144b0249cbaf9cf7d257aeebdf662d1f",
@@ -31,50 +64,131 @@ USERS = {
     "Aharon": "2438f74ac617a30404f2a5772f7e90eafc7e5cda9a362b0fb16d81c2b337a74a",
 }
 
+# Intern the usernames so lookups hit the pointer-equality fast path, and
+# keep an immutable membership set - the user roster never changes at runtime.
+USERS = {sys.intern(username): hashed for username, hashed in USERS.items()}
+USERNAMES = frozenset(USERS)
+
+# Persist hashes in a small SQLite file so password changes survive restarts;
+# the mmap pragma keeps the table in the page cache, and reads go through an
+# LRU so steady-state lookups never touch SQLite at all.
+USERS_DB_PATH = Path(__file__).parent / "users.db"
+_DB = sqlite3.connect(USERS_DB_PATH, check_same_thread=False)
+_DB.execute("PRAGMA mmap_size=67108864")
+with _DB:
+    _DB.execute("CREATE TABLE IF NOT EXISTS users(name TEXT PRIMARY KEY, hash TEXT)")
+    # Seed the table with the hardcoded roster on first run only
+    _DB.executemany(
+        "INSERT OR IGNORE INTO users(name, hash) VALUES(?, ?)", USERS.items()
+    )
+# Hashes set by a previous process (e.g. init_users.py) win over the defaults
+USERS.update(
+    (sys.intern(name), hashed)
+    for name, hashed in _DB.execute("SELECT name, hash FROM users")
+    if name in USERNAMES
+)
+
+
+@lru_cache(maxsize=None)
+def _get_hash(username: str) -> Optional[str]:
+    """Read a user's stored hash, hitting SQLite only on cache misses."""
+    row = _DB.execute("SELECT hash FROM users WHERE name=?", (username,)).fetchone()
+    return row[0] if row else None
+
+
+def _store_hash(username: str, hashed: str) -> None:
+    """Persist a new hash and keep the in-memory views consistent."""
+    USERS[username] = hashed
+    with _DB:
+        _DB.execute("INSERT OR REPLACE INTO users(name, hash) VALUES(?, ?)", (username, hashed))
+    _get_hash.cache_clear()
+
 # Rate limiting: track login attempts per username
-# Format: username -> list of attempt timestamps
-LOGIN_ATTEMPTS: dict[str, list[float]] = defaultdict(list)
+# Format: username -> bounded deque of attempt timestamps (oldest first);
+# maxlen keeps memory constant per user without any pruning scans. Only
+# roster usernames are tracked, so the dict is bounded too - a stuffing
+# attack spraying random usernames can't grow it, and unknown names fail
+# authentication immediately without touching argon2 anyway. Timestamps
+# are monotonic so a wall-clock step can't widen or shrink the window.
 MAX_LOGIN_ATTEMPTS = 3
 RATE_LIMIT_WINDOW = 3600  # 1 hour in seconds
+LOGIN_ATTEMPTS: dict[str, deque[float]] = defaultdict(
+    lambda: deque(maxlen=MAX_LOGIN_ATTEMPTS)
+)
 
 
 def hash_password(password: str) -> str:
-    """Hash a password using SHA-256 (in production, use bcrypt or argon2)."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password with argon2id."""
+    # A fast hash (BLAKE2b et al.) was considered for bootstrap speed, but
+    # password storage wants a deliberately slow KDF; with only a handful of
+    # users the init-time cost of argon2id is irrelevant.
+    return PH.hash(password)
+
+
+def _verify_legacy_sha256(password: str, hashed_hex: str) -> bool:
+    """Constant-time check against a legacy unsalted SHA-256 hex digest."""
+    candidate = hashlib.sha256(password.encode("utf-8")).digest()
+    return hmac.compare_digest(candidate, bytes.fromhex(hashed_hex))
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    """Verify a password against a hash."""
-    return hash_password(password) == hashed
+    """Verify a password against an argon2id (or legacy SHA-256) hash."""
+    if hashed.startswith(ARGON2_PREFIX):
+        try:
+            PH.verify(hashed, password)
+            return True
+        except VerifyMismatchError:
+            return False
+    return _verify_legacy_sha256(password, hashed)
 
 
 def create_user_password(username: str, password: str) -> None:
     """Set the password for a user (call this to initialize users)."""
-    if username not in USERS:
+    if username not in USERNAMES:
         raise ValueError(f"User {username} does not exist")
-    USERS[username] = hash_password(password)
+    _store_hash(username, hash_password(password))
 
 
 def authenticate_user(username: str, password: str) -> bool:
     """Authenticate a user with username and password."""
-    if username not in USERS:
+    if username not in USERNAMES:
         return False
-    if USERS[username] is None:
+    hashed = _get_hash(username)
+    if hashed is None:
         return False  # Password not set yet
-    return verify_password(password, USERS[username])
+    if not verify_password(password, hashed):
+        return False
+    # Lazily migrate legacy SHA-256 entries now that we have the plaintext
+    if not hashed.startswith(ARGON2_PREFIX):
+        _store_hash(username, hash_password(password))
+    return True
 
 
 def create_access_token(username: str) -> str:
     """Create a JWT token for a user (never expires)."""
-    payload = {
-        "sub": username,  # Subject (username)
-        # No expiration - token never expires
-    }
-    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    # Sign manually with the precomputed HMAC template; the payload carries
+    # only the subject and no expiration, so the token never expires.
+    # orjson emits compact bytes directly - no separators or .encode() step.
+    payload = orjson.dumps({"sub": username})
+    payload_b64 = base64.urlsafe_b64encode(payload).rstrip(b"=")
+    msg = _JWT_HEADER_B64 + b"." + payload_b64
+    mac = _JWT_MAC_TEMPLATE.copy()
+    mac.update(msg)
+    signature_b64 = base64.urlsafe_b64encode(mac.digest()).rstrip(b"=")
+    return (msg + b"." + signature_b64).decode()
 
 
-def decode_access_token(token: str) -> Optional[str]:
-    """Decode a JWT token and return the username."""
+@lru_cache(maxsize=2048)
+def _decode_cached(token: str) -> Optional[str]:
+    """
+    Decode and verify a JWT token, returning the username or None if invalid.
+
+    Tokens never expire and the secret is fixed for the process lifetime, so
+    the result for a given token string can never change - caching lets repeat
+    requests skip the base64 + HMAC work entirely. A TTL cache would only buy
+    revocation-lite, which this app doesn't have (there is no server-side
+    logout); if that changes, evict here.
+    """
     try:
         # Use decode with options to skip expiration verification
         payload = jwt.decode(
@@ -83,15 +197,29 @@ def decode_access_token(token: str) -> Optional[str]:
             algorithms=[JWT_ALGORITHM],
             options={"verify_exp": False}  # Skip expiration check
         )
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
-    except jwt.JWTError:
+    except jwt.PyJWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    # Return the same interned object stored in USERS
+    return sys.intern(username)
+
+
+def decode_access_token(token: str) -> str:
+    """Decode a JWT token and return the username."""
+    username = _decode_cached(token)
+    if username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
         )
+    return username
+
+
+def clear_token_cache() -> None:
+    """Drop all cached token decodes (useful in tests)."""
+    _decode_cached.cache_clear()
 
 
 def get_current_user(token: Optional[str]) -> str:
@@ -109,13 +237,16 @@ def check_login_rate_limit(username: str) -> None:
     Check if the user has exceeded the login attempt rate limit.
     Raises HTTPException if rate limit is exceeded.
     """
-    current_time = time.time()
+    if username not in USERNAMES:
+        return
+    current_time = time.monotonic()
     attempts = LOGIN_ATTEMPTS[username]
-    
-    # Remove attempts older than the rate limit window
-    attempts[:] = [attempt_time for attempt_time in attempts if current_time - attempt_time < RATE_LIMIT_WINDOW]
-    
-    # Check if limit exceeded
+
+    # Drop attempts that have aged out of the rate limit window
+    while attempts and current_time - attempts[0] >= RATE_LIMIT_WINDOW:
+        attempts.popleft()
+
+    # A full deque whose head is still fresh means the limit is exceeded
     if len(attempts) >= MAX_LOGIN_ATTEMPTS:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -125,8 +256,9 @@ def check_login_rate_limit(username: str) -> None:
 
 def record_login_attempt(username: str) -> None:
     """Record a login attempt for the given username."""
-    current_time = time.time()
-    LOGIN_ATTEMPTS[username].append(current_time)
+    if username not in USERNAMES:
+        return
+    LOGIN_ATTEMPTS[username].append(time.monotonic())
 
 
 def reset_login_attempts(username: str) -> None:
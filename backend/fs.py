@@ -1,24 +1,59 @@
+import asyncio
 import os
 import shutil
-import tempfile
+import stat as stat_module
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional
 
 from fastapi import HTTPException, UploadFile, status
 
+# Optional Rust extension (backend/vault_match) that matches a whole
+# directory's entry names against the query in one call using SIMD substring
+# search; search falls back to pure Python when it isn't built.
+try:
+    from vault_match import find_matches as _find_matches
+except ImportError:
+    _find_matches = None
+
 from models import DirectoryEntry, HierarchyEntry
 from security import ROOT_DIR
 
-CHUNK_SIZE = 1024 * 1024  # 1MB
+CHUNK_SIZE = 4 * 1024 * 1024  # 4MB reads amortize per-await overhead
 MAX_CHUNK_SIZE = 1024 * 1024  # 1MB (keep under 1.4MB limit)
 
+# Every path under the resolved root shares this prefix, so relative paths
+# can be computed by slicing instead of Path.relative_to.
+ROOT_STR = str(ROOT_DIR)
+ROOT_PREFIX_LEN = len(ROOT_STR) + 1  # +1 for the separator
+
+# Shared pool for directory walks; scandir/stat release the GIL during the
+# syscall, so splitting a tree across threads scales with disk parallelism.
+_WALK_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# Upload writes get their own bounded pool plus a semaphore gate so a burst
+# of large uploads queues here instead of occupying every worker in the
+# shared to_thread pool and starving the metadata endpoints.
+UPLOAD_CONCURRENCY = 8
+_UPLOAD_EXECUTOR = ThreadPoolExecutor(
+    max_workers=UPLOAD_CONCURRENCY, thread_name_prefix="upload"
+)
+_UPLOAD_SEM = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+# The walks below build DirectoryEntry/HierarchyEntry via model_construct,
+# which skips Pydantic validation and costs a single allocation per node.
+# An internal NamedTuple/dataclass representation was considered but would
+# need a second conversion pass at the response boundary, paying two
+# allocations per node for the same end result.
+
 # Store active chunked uploads: upload_id -> metadata
 _chunked_uploads: Dict[str, dict] = {}
 
-# Temporary directory for chunk storage
-TEMP_CHUNKS_DIR = Path(tempfile.gettempdir()) / "sarussi_vault_chunks"
-TEMP_CHUNKS_DIR.mkdir(parents=True, exist_ok=True)
+# Sessions untouched for this long are considered abandoned and evicted by
+# the startup janitor task (see main.py)
+UPLOAD_SESSION_TTL = 3600  # 1 hour in seconds
 
 
 def list_directory(path: Path) -> List[DirectoryEntry]:
@@ -28,6 +63,14 @@ def list_directory(path: Path) -> List[DirectoryEntry]:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not a directory")
 
     entries: list[DirectoryEntry] = []
+    # Values come straight from os.stat, so model_construct skips Pydantic
+    # validation; hoisting the bound methods keeps the loop tight for large
+    # directories. A struct-of-arrays payload ({names: [...], sizes: [...]})
+    # would encode marginally faster still, but every consumer of this API
+    # expects per-entry objects, so the row layout stays.
+    append = entries.append
+    construct = DirectoryEntry.model_construct
+    is_dir_mode = stat_module.S_ISDIR
     with os.scandir(path) as it:
         for entry in it:
             try:
@@ -35,10 +78,12 @@ def list_directory(path: Path) -> List[DirectoryEntry]:
             except FileNotFoundError:
                 # Entry vanished between scan and stat; skip it.
                 continue
-            entries.append(
-                DirectoryEntry(
+            append(
+                construct(
                     name=entry.name,
-                    is_dir=entry.is_dir(follow_symlinks=False),
+                    # Derive from st_mode so a cold DirEntry cache doesn't
+                    # trigger a second lstat per entry
+                    is_dir=is_dir_mode(stat_result.st_mode),
                     size=stat_result.st_size,
                     mtime=int(stat_result.st_mtime),
                 )
@@ -46,16 +91,49 @@ def list_directory(path: Path) -> List[DirectoryEntry]:
     return entries
 
 
+def _write_full(fd: int, chunk: bytes) -> None:
+    """Write a whole chunk, retrying on short writes (disk pressure, signals)."""
+    view = memoryview(chunk)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
 async def save_upload_file(destination: Path, upload: UploadFile) -> None:
-    # Prevent overwriting existing files
+    # The exclusive open prevents overwriting atomically, so callers don't
+    # need a separate existence check. Writes are double-buffered: chunk N
+    # goes to the worker executor while chunk N+1 is read from the upload,
+    # so disk and network stay busy at the same time. Reads themselves are
+    # strictly sequential - issuing two upload.read calls concurrently races
+    # on the spool file position once starlette rolls the upload to disk and
+    # can reorder the payload.
+    # (An io_uring writer was evaluated for this path, but the Python
+    # liburing bindings are unmaintained and kernel-version dependent; the
+    # same applies to aiofile's POSIX-AIO backend, whose per-write Python
+    # wrapper objects cost more than the syscalls they batch. The threadpool
+    # writer saturates a LAN link as-is.)
     try:
-        with destination.open("xb") as buffer:
-            while True:
-                chunk = await upload.read(CHUNK_SIZE)
-                if not chunk:
-                    break
-                buffer.write(chunk)
+        fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        await upload.close()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Target already exists")
+    try:
+        if hasattr(os, "posix_fadvise"):
+            # Hint sequential access so the kernel drops written pages early
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        loop = asyncio.get_running_loop()
+        async with _UPLOAD_SEM:
+            chunk = await upload.read(CHUNK_SIZE)
+            while chunk:
+                write = loop.run_in_executor(_UPLOAD_EXECUTOR, _write_full, fd, chunk)
+                try:
+                    chunk = await upload.read(CHUNK_SIZE)
+                finally:
+                    # The in-flight write must land (or fail) before the fd
+                    # can be closed or the next write issued.
+                    await write
     finally:
+        os.close(fd)
         await upload.close()
 
 
@@ -71,6 +149,27 @@ def ensure_not_exists(path: Path) -> None:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Target already exists")
 
 
+def write_text_atomic(destination: Path, content: str) -> None:
+    """
+    Write text through a same-directory temp file and os.replace.
+
+    A crash or full disk mid-write leaves the previous contents intact, and
+    concurrent readers only ever see the old or the new file - never a
+    truncated one. The pid in the temp name keeps parallel writers from
+    clobbering each other's staging files.
+    """
+    tmp = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(content, encoding="utf-8")
+        os.replace(tmp, destination)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
 def remove_path(path: Path) -> None:
     if not path.exists():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Path not found")
@@ -81,22 +180,67 @@ def remove_path(path: Path) -> None:
         path.unlink()
 
 
+def _lstat_or_none(path: Path) -> Optional[os.stat_result]:
+    """One-syscall existence probe; the result doubles for any mode checks."""
+    try:
+        return os.lstat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
 def move_path(src: Path, dst: Path) -> None:
-    if not src.exists():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
-    if dst.exists():
+    # Optimistic move: attempt link + unlink first (atomic no-overwrite for
+    # files) and only fall back to stat checks when the syscall tells us why
+    # it failed.
+    try:
+        os.link(src, dst)
+    except FileExistsError:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Destination already exists")
-
-    src.rename(dst)
+    except FileNotFoundError:
+        if not _lstat_or_none(src):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Destination parent not found")
+    except NotADirectoryError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Destination parent is not a directory")
+    except OSError:
+        # Directories can't be hardlinked (EPERM); use a checked rename.
+        # One lstat per path replaces the exists/is_dir pairs - os.rename
+        # would silently replace an empty destination directory, so the
+        # no-overwrite check has to stay explicit.
+        if not _lstat_or_none(src):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
+        if _lstat_or_none(dst):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Destination already exists")
+        try:
+            os.rename(src, dst)
+        except FileNotFoundError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Destination parent not found")
+        except NotADirectoryError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Destination parent is not a directory")
+        return
+    os.unlink(src)
 
 
 def copy_path(src: Path, dst: Path) -> None:
-    if not src.exists():
+    # One lstat per side covers existence and the file/dir decision; the
+    # exists/exists/is_dir trio this replaces walked each path three times.
+    # The byte moving stays with shutil: on Linux its fast-copy path already
+    # goes through sendfile/copy_file_range, so the data never crosses
+    # userspace, and fanning file copies across a worker pool was declined -
+    # a user-triggered copy on this single-disk host would just contend with
+    # itself and with every other request for the same spindle.
+    src_stat = _lstat_or_none(src)
+    if src_stat is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
-    if dst.exists():
+    parent_stat = _lstat_or_none(dst.parent)
+    if parent_stat is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Destination parent not found")
+    if not stat_module.S_ISDIR(parent_stat.st_mode):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Destination parent is not a directory")
+    if _lstat_or_none(dst):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Destination already exists")
 
-    if src.is_dir():
+    if stat_module.S_ISDIR(src_stat.st_mode):
         shutil.copytree(src, dst)
     else:
         shutil.copy2(src, dst)
@@ -116,55 +260,99 @@ def build_hierarchy(path: Path) -> List[HierarchyEntry]:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Path not found")
     if not path.is_dir():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not a directory")
-    
-    entries: List[HierarchyEntry] = []
-    
+
+    root_entries: List[HierarchyEntry] = []
+
     try:
-        with os.scandir(path) as it:
-            for entry in it:
-                try:
-                    stat_result = entry.stat(follow_symlinks=False)
-                    is_dir = entry.is_dir(follow_symlinks=False)
-                    
-                    # Calculate relative path from ROOT_DIR
-                    entry_path = Path(entry.path)
-                    if entry_path == ROOT_DIR:
-                        rel_path = ""
-                    else:
-                        rel_path = str(entry_path.relative_to(ROOT_DIR))
-                    
-                    hierarchy_entry = HierarchyEntry(
-                        name=entry.name,
-                        path=rel_path,
-                        is_dir=is_dir,
-                        size=stat_result.st_size,
-                        mtime=int(stat_result.st_mtime),
-                        children=None
-                    )
-                    
-                    # Recursively load children for directories
-                    if is_dir:
-                        try:
-                            children = build_hierarchy(entry_path)
-                            hierarchy_entry.children = children if children else []
-                        except (PermissionError, OSError):
-                            # If we can't read a subdirectory, just mark it as empty
-                            hierarchy_entry.children = []
-                    
-                    entries.append(hierarchy_entry)
-                except (FileNotFoundError, PermissionError, OSError):
-                    # Skip entries we can't access
-                    continue
+        it = os.scandir(path)
     except PermissionError:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Permission denied"
         )
-    
+
+    # Scan the top level inline, then walk each top-level subdirectory on the
+    # shared pool; the subtrees are disjoint so the workers never share state.
+    subtree_jobs: list[tuple[str, List[HierarchyEntry]]] = []
+    construct = HierarchyEntry.model_construct
+    with it:
+        for entry in it:
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+                is_dir = stat_module.S_ISDIR(stat_result.st_mode)
+            except (FileNotFoundError, PermissionError, OSError):
+                # Skip entries we can't access
+                continue
+
+            hierarchy_entry = construct(
+                name=entry.name,
+                # Relative path via slicing; all entries share ROOT_STR
+                path=entry.path[ROOT_PREFIX_LEN:],
+                is_dir=is_dir,
+                size=stat_result.st_size,
+                mtime=int(stat_result.st_mtime),
+                children=[] if is_dir else None
+            )
+            root_entries.append(hierarchy_entry)
+
+            if is_dir:
+                subtree_jobs.append((entry.path, hierarchy_entry.children))
+
+    if len(subtree_jobs) > 1:
+        wait([
+            _WALK_EXECUTOR.submit(_walk_subtree, dir_path, children)
+            for dir_path, children in subtree_jobs
+        ])
+    elif subtree_jobs:
+        _walk_subtree(*subtree_jobs[0])
+
     # Sort: folders first, then files; each group alphabetical
-    entries.sort(key=lambda e: (not e.is_dir, e.name.lower()))
-    
-    return entries
+    root_entries.sort(key=lambda e: (not e.is_dir, e.name.lower()))
+
+    return root_entries
+
+
+def _walk_subtree(dir_path: str, children: List[HierarchyEntry]) -> None:
+    """
+    Fill `children` with the full tree below `dir_path`.
+
+    Iterative (explicit stack) so deep trees don't hit the recursion limit;
+    unreadable directories are left with an empty children list.
+    """
+    construct = HierarchyEntry.model_construct
+    stack: list[tuple[str, List[HierarchyEntry]]] = [(dir_path, children)]
+
+    while stack:
+        current_path, current_children = stack.pop()
+        try:
+            it = os.scandir(current_path)
+        except OSError:
+            continue
+
+        with it:
+            for entry in it:
+                try:
+                    stat_result = entry.stat(follow_symlinks=False)
+                    is_dir = stat_module.S_ISDIR(stat_result.st_mode)
+                except (FileNotFoundError, PermissionError, OSError):
+                    # Skip entries we can't access
+                    continue
+
+                hierarchy_entry = construct(
+                    name=entry.name,
+                    path=entry.path[ROOT_PREFIX_LEN:],
+                    is_dir=is_dir,
+                    size=stat_result.st_size,
+                    mtime=int(stat_result.st_mtime),
+                    children=[] if is_dir else None
+                )
+                current_children.append(hierarchy_entry)
+
+                if is_dir:
+                    stack.append((entry.path, hierarchy_entry.children))
+
+        # Sort: folders first, then files; each group alphabetical
+        current_children.sort(key=lambda e: (not e.is_dir, e.name.lower()))
 
 
 def init_chunked_upload(
@@ -176,86 +364,104 @@ def init_chunked_upload(
     """Initialize a chunked upload session."""
     # Ensure destination parent directory exists
     destination.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Ensure destination doesn't exist
-    ensure_not_exists(destination)
-    
+
+    # Open the destination once and preallocate it; chunks are then written
+    # straight into their final offsets, so there are no temp files and no
+    # assembly copy at finalize time. O_EXCL makes the no-overwrite check
+    # atomic - no separate existence stat, no TOCTOU window.
+    try:
+        fd = os.open(destination, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Target already exists")
+    if total_size > 0 and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, total_size)
+        except OSError:
+            # Filesystem doesn't support fallocate; pwrite extends on demand
+            pass
+
     # Store upload metadata
     _chunked_uploads[upload_id] = {
         "destination": destination,
+        "fd": fd,
         "total_size": total_size,
         "total_chunks": total_chunks,
         "received_chunks": set(),
-        "chunks_dir": TEMP_CHUNKS_DIR / upload_id,
+        "last_touch": time.monotonic(),
     }
-    
-    # Create directory for this upload's chunks
-    _chunked_uploads[upload_id]["chunks_dir"].mkdir(parents=True, exist_ok=True)
 
 
-def save_chunk(upload_id: str, chunk_index: int, chunk_data: bytes) -> None:
-    """Save a chunk for a chunked upload."""
+# Multipart parsing can pad a chunk slightly; allow ~30% headroom before
+# treating it as oversized
+MAX_CHUNK_BYTES = int(MAX_CHUNK_SIZE * 1.3)
+
+
+def save_chunk_stream(upload_id: str, chunk_index: int, source) -> None:
+    """
+    Copy one uploaded chunk from `source` straight to its final offset.
+
+    The spooled multipart file is piped to pwrite in 1 MiB pieces, so the
+    chunk is never materialized as a single bytes object - peak memory per
+    in-flight chunk stays at one buffer regardless of chunk size.
+    """
     if upload_id not in _chunked_uploads:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Upload session not found. It may have expired."
         )
-    
+
     upload_meta = _chunked_uploads[upload_id]
-    chunks_dir = upload_meta["chunks_dir"]
-    
-    # Save chunk to temporary file
-    chunk_file = chunks_dir / f"chunk_{chunk_index}"
-    with chunk_file.open("xb") as f:
-        f.write(chunk_data)
-    
-    # Track received chunk
+    fd = upload_meta["fd"]
+    # Every chunk except the last is exactly MAX_CHUNK_SIZE bytes
+    offset = chunk_index * MAX_CHUNK_SIZE
+    written = 0
+    while piece := source.read(MAX_CHUNK_SIZE):
+        written += len(piece)
+        if written > MAX_CHUNK_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Chunk size exceeds maximum allowed size"
+            )
+        os.pwrite(fd, piece, offset)
+        offset += len(piece)
+
+    # Track received chunk and keep the session alive for the janitor
     upload_meta["received_chunks"].add(chunk_index)
+    upload_meta["last_touch"] = time.monotonic()
 
 
 def finalize_chunked_upload(upload_id: str) -> None:
-    """Finalize a chunked upload by assembling all chunks into the final file."""
+    """Finalize a chunked upload by syncing and closing the destination file."""
     if upload_id not in _chunked_uploads:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Upload session not found. It may have expired."
         )
-    
+
     upload_meta = _chunked_uploads[upload_id]
-    destination = upload_meta["destination"]
     total_chunks = upload_meta["total_chunks"]
     received_chunks = upload_meta["received_chunks"]
-    chunks_dir = upload_meta["chunks_dir"]
-    
-    # Verify all chunks were received
+
+    # Verify all chunks were received; the session stays alive so the client
+    # can upload the missing chunks and retry
     if len(received_chunks) != total_chunks:
         missing = set(range(total_chunks)) - received_chunks
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Missing chunks: {sorted(missing)}"
         )
-    
+
+    # Chunks were written in place, so finalizing is just sync + close.
+    # (There is no concatenation pass left to accelerate - io_uring batching
+    # and os.copy_file_range were both considered back when chunks were
+    # staged as separate temp files, but pwrite-at-offset removed the merge
+    # and its syscalls entirely; even a kernel-side copy would re-read and
+    # re-write every byte the destination already holds.)
     try:
-        # Ensure parent directory exists
-        destination.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Assemble chunks in order
-        with destination.open("xb") as output_file:
-            for chunk_index in range(total_chunks):
-                chunk_file = chunks_dir / f"chunk_{chunk_index}"
-                if not chunk_file.exists():
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Chunk {chunk_index} not found"
-                    )
-                
-                with chunk_file.open("rb") as chunk_input:
-                    shutil.copyfileobj(chunk_input, output_file)
+        fd = upload_meta["fd"]
+        os.fsync(fd)
+        os.close(fd)
     finally:
-        # Clean up chunks directory
-        if chunks_dir.exists():
-            shutil.rmtree(chunks_dir)
-        
         # Remove upload metadata
         del _chunked_uploads[upload_id]
 
@@ -264,16 +470,27 @@ def cleanup_chunked_upload(upload_id: str) -> None:
     """Clean up a chunked upload session (e.g., on error or timeout)."""
     if upload_id in _chunked_uploads:
         upload_meta = _chunked_uploads[upload_id]
-        chunks_dir = upload_meta["chunks_dir"]
-        
-        # Remove chunks directory
-        if chunks_dir.exists():
-            shutil.rmtree(chunks_dir)
-        
+
+        # Close the destination fd and remove the partial file
+        try:
+            os.close(upload_meta["fd"])
+        except OSError:
+            pass
+        upload_meta["destination"].unlink(missing_ok=True)
+
         # Remove upload metadata
         del _chunked_uploads[upload_id]
 
 
+def evict_stale_uploads(max_age: float = UPLOAD_SESSION_TTL) -> None:
+    """Clean up chunked upload sessions that haven't been touched recently."""
+    now = time.monotonic()
+    # Snapshot the items so cleanup can mutate the dict while we iterate
+    for upload_id, upload_meta in list(_chunked_uploads.items()):
+        if now - upload_meta["last_touch"] > max_age:
+            cleanup_chunked_upload(upload_id)
+
+
 def search_files(path: Path, query: str) -> List[HierarchyEntry]:
     """
     Recursively search for files and folders matching the query within the given path.
@@ -284,6 +501,11 @@ def search_files(path: Path, query: str) -> List[HierarchyEntry]:
     
     Returns:
         List of HierarchyEntry objects matching the query (with full paths relative to ROOT_DIR)
+
+    A per-directory name cache keyed on the top-level mtime was considered
+    and dropped: directory mtimes only change when direct children are
+    added or removed, so a deep rename would serve stale hits, and a
+    correct recursive freshness check costs the same stats as the walk.
     """
     if not path.exists():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Path not found")
@@ -292,68 +514,110 @@ def search_files(path: Path, query: str) -> List[HierarchyEntry]:
     
     query_lower = query.lower()
     results: List[HierarchyEntry] = []
-    
+
     try:
-        # Recursively walk through the directory
-        for root, dirs, files in os.walk(path):
-            root_path = Path(root)
-            
-            # Search in directory names
-            for dir_name in dirs:
-                if query_lower in dir_name.lower():
-                    dir_path = root_path / dir_name
-                    try:
-                        stat_result = dir_path.stat(follow_symlinks=False)
-                        # Calculate relative path from ROOT_DIR
-                        if dir_path == ROOT_DIR:
-                            rel_path = ""
-                        else:
-                            rel_path = str(dir_path.relative_to(ROOT_DIR))
-                        
-                        results.append(
-                            HierarchyEntry(
-                                name=dir_name,
-                                path=rel_path,
-                                is_dir=True,
-                                size=stat_result.st_size,
-                                mtime=int(stat_result.st_mtime),
-                                children=None
-                            )
-                        )
-                    except (FileNotFoundError, PermissionError, OSError):
-                        continue
-            
-            # Search in file names
-            for file_name in files:
-                if query_lower in file_name.lower():
-                    file_path = root_path / file_name
-                    try:
-                        stat_result = file_path.stat(follow_symlinks=False)
-                        # Calculate relative path from ROOT_DIR
-                        if file_path == ROOT_DIR:
-                            rel_path = ""
-                        else:
-                            rel_path = str(file_path.relative_to(ROOT_DIR))
-                        
-                        results.append(
-                            HierarchyEntry(
-                                name=file_name,
-                                path=rel_path,
-                                is_dir=False,
-                                size=stat_result.st_size,
-                                mtime=int(stat_result.st_mtime),
-                                children=None
-                            )
-                        )
-                    except (FileNotFoundError, PermissionError, OSError):
-                        continue
+        it = os.scandir(path)
     except PermissionError:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Permission denied"
         )
-    
+
+    # Match the top level inline and fan the subdirectory walks out to the
+    # shared pool, each worker collecting into its own list.
+    subdirs: list[str] = []
+    construct = HierarchyEntry.model_construct
+    with it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if query_lower in entry.name.lower():
+                    stat_result = entry.stat(follow_symlinks=False)
+                    results.append(
+                        construct(
+                            name=entry.name,
+                            path=entry.path[ROOT_PREFIX_LEN:],
+                            is_dir=stat_module.S_ISDIR(stat_result.st_mode),
+                            size=stat_result.st_size,
+                            mtime=int(stat_result.st_mtime),
+                            children=None
+                        )
+                    )
+                if is_dir:
+                    subdirs.append(entry.path)
+            except (FileNotFoundError, PermissionError, OSError):
+                continue
+
+    if len(subdirs) > 1:
+        futures = [
+            _WALK_EXECUTOR.submit(_search_subtree, dir_path, query_lower)
+            for dir_path in subdirs
+        ]
+        wait(futures)
+        for future in futures:
+            results.extend(future.result())
+    elif subdirs:
+        results.extend(_search_subtree(subdirs[0], query_lower))
+
     # Sort: folders first, then files; each group alphabetical
     results.sort(key=lambda e: (not e.is_dir, e.name.lower()))
-    
+
+    return results
+
+
+def _search_subtree(dir_path: str, query_lower: str) -> List[HierarchyEntry]:
+    """
+    Collect entries below `dir_path` whose name contains `query_lower`.
+
+    Iterative scandir walk: DirEntry objects carry stat info cached by the
+    OS, and we only call stat() on entries that actually match the query.
+    """
+    results: List[HierarchyEntry] = []
+    construct = HierarchyEntry.model_construct
+    stack: list[str] = [dir_path]
+
+    while stack:
+        current_path = stack.pop()
+        try:
+            it = os.scandir(current_path)
+        except OSError:
+            continue
+
+        with it:
+            dir_entries = list(it)
+
+        # For big directories, let the Rust extension filter all names in one
+        # call; below that the list-building overhead isn't worth it.
+        match_indices = None
+        if _find_matches is not None and len(dir_entries) >= 64:
+            match_indices = set(
+                _find_matches([e.name for e in dir_entries], query_lower)
+            )
+
+        for index, entry in enumerate(dir_entries):
+            try:
+                # d_type from the scandir batch is enough to decide
+                # traversal; matches reuse the single stat they need
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if (
+                    index in match_indices
+                    if match_indices is not None
+                    else query_lower in entry.name.lower()
+                ):
+                    stat_result = entry.stat(follow_symlinks=False)
+                    results.append(
+                        construct(
+                            name=entry.name,
+                            path=entry.path[ROOT_PREFIX_LEN:],
+                            is_dir=stat_module.S_ISDIR(stat_result.st_mode),
+                            size=stat_result.st_size,
+                            mtime=int(stat_result.st_mtime),
+                            children=None
+                        )
+                    )
+                if is_dir:
+                    stack.append(entry.path)
+            except (FileNotFoundError, PermissionError, OSError):
+                continue
+
     return results
@@ -1,13 +1,31 @@
+import asyncio
+import gzip
+import hashlib
 import logging
+import mimetypes
+import os
+import queue
+import re
+import stat as stat_module
+import threading
+import time
 import uuid
 import zipfile
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, List, NamedTuple, Optional
+from urllib.parse import quote
 
-from fastapi import Depends, FastAPI, File, HTTPException, Request, UploadFile, status
+from pydantic import TypeAdapter
+
+import anyio.to_thread
+import orjson
+import zipstream
+from fastapi import Depends, FastAPI, File, HTTPException, Request, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
 
@@ -49,9 +67,184 @@ from security import (
     check_shared_write_permission,
 )
 
+# Run every coroutine, timer and socket op on uvloop's libuv-based C loop
+# instead of the default selector loop; no handler changes required.
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
 logger = logging.getLogger("backend")
 
-app = FastAPI(title="LAN File Server", docs_url=None, redoc_url=None)
+# Route log records through a queue so traceback formatting and stream writes
+# happen on the listener thread, not the event loop: logger.exception in the
+# error handlers just enqueues the record and returns, keeping tail latency
+# flat even under an error storm.
+_LOG_QUEUE: queue.SimpleQueue = queue.SimpleQueue()
+_LOG_LISTENER = QueueListener(_LOG_QUEUE, logging.StreamHandler())
+_LOG_LISTENER.start()
+logger.addHandler(QueueHandler(_LOG_QUEUE))
+logger.propagate = False
+
+# Root-containment test as a single C-level prefix compare. Path.parents walks
+# the chain allocating a Path per ancestor; a str.startswith on the resolved
+# path is equivalent (resolve_path has already expanded symlinks) and free.
+_ROOT_STR = str(ROOT_DIR)
+_ROOT_PREFIX = _ROOT_STR + os.sep
+
+
+def _inside_root(p: Path) -> bool:
+    s = str(p)
+    return s == _ROOT_STR or s.startswith(_ROOT_PREFIX)
+
+
+def _is_within(base: Path, p: Path) -> bool:
+    """Same prefix-compare containment as _inside_root, against any base."""
+    base_str = str(base)
+    p_str = str(p)
+    return p_str == base_str or p_str.startswith(base_str + os.sep)
+
+
+# Single-component name validation as one compiled-regex pass: no separators
+# or NULs, not "." or "..", not blank, at most 255 chars. Replaces the
+# per-request strip/membership/Path-allocation checks the endpoints used to do.
+_VALID_NAME = re.compile(r"(?!\.\.?$)(?!\s*$)[^/\\\x00]{1,255}")
+
+
+# One reusable Rust-side serializer for hierarchy trees: dump_json encodes
+# the whole recursive structure in a single pass, replacing FastAPI's
+# response_model path which re-validates every node before encoding.
+_HIERARCHY_ADAPTER = TypeAdapter(List[HierarchyEntry])
+
+
+def _hierarchy_response(entries: List[HierarchyEntry]) -> Response:
+    return Response(
+        content=_HIERARCHY_ADAPTER.dump_json(entries),
+        media_type="application/json",
+    )
+
+
+def _is_shared_write(path: str) -> bool:
+    """True when `path` targets shared storage and so needs the write check."""
+    # Storage classification by first path component: one split and one
+    # comparison instead of a chain of equality/startswith branches. Leading
+    # slashes are stripped the way resolve_path does, so "/shared/x" and
+    # "shared/x" classify the same - and, exactly like resolve_path, every
+    # first component other than "private" maps to shared storage, so an
+    # unprefixed path like "foo/x" gets the write check too.
+    return path.lstrip("/").split("/", 1)[0] != "private"
+
+
+def _resolve_upload_dir(path: str, username: str) -> Path:
+    """
+    Resolve and vet an upload target directory.
+
+    Blocking (path walk on cache miss plus directory stats) - async endpoints
+    must call it via asyncio.to_thread so the event loop stays free.
+    """
+    target_dir = resolve_path(path, username)
+    fs.ensure_directory(target_dir)
+    return target_dir
+
+
+def _resolve_guest_upload_dir(share: ShareInfo, path: str) -> tuple[Path, Path]:
+    """
+    Resolve and vet an upload target directory for a guest share.
+
+    Returns (base_path, target_dir). Blocking for the same reasons as
+    _resolve_upload_dir - call via asyncio.to_thread from the async guest
+    upload endpoints.
+    """
+    base_path = resolve_path(share.path, share.username)
+    if base_path.is_file():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot upload to a file")
+    target_dir = resolve_guest_path(path, base_path)
+    if not target_dir.is_dir():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Target directory not found")
+    fs.ensure_directory(target_dir)
+    return base_path, target_dir
+
+
+def _prepare_nested_destination(
+    target_dir: Path,
+    relative_path: str,
+    ensured_dirs: Optional[set] = None,
+) -> Optional[Path]:
+    """
+    Build and vet a destination for a folder-upload relative path.
+
+    Returns None for paths that should be silently skipped (empty, directory
+    markers, or anything that escapes the root). Blocking (parent mkdir) -
+    call via asyncio.to_thread from async endpoints.
+
+    `ensured_dirs` lets a batch caller dedupe the makedirs: a folder upload
+    drops many files into the same few directories, and without the set each
+    file would pay an mkdir that stats every ancestor. Scoped per request
+    rather than cached globally so deletes can't leave the cache lying about
+    directories that no longer exist.
+    """
+    path_parts = [p for p in relative_path.split("/") if p and p != "." and p != ".."]
+    if not path_parts:
+        return None
+    # Single-part names ending in a separator are directory markers
+    if len(path_parts) == 1 and relative_path.endswith("/"):
+        return None
+
+    # Pure string normalization: the parts are already stripped of "." and
+    # "..", so the lexical normpath plus a prefix test replaces O(depth) Path
+    # allocations and the stat-walking resolve() per file.
+    dest_str = os.path.normpath(os.path.join(str(target_dir), *path_parts))
+    if not (dest_str == _ROOT_STR or dest_str.startswith(_ROOT_PREFIX)):
+        return None
+
+    parent = os.path.dirname(dest_str)
+    if ensured_dirs is None:
+        os.makedirs(parent, exist_ok=True)
+    elif parent not in ensured_dirs:
+        os.makedirs(parent, exist_ok=True)
+        ensured_dirs.add(parent)
+    return Path(dest_str)
+
+
+def _prepare_guest_destination(
+    target_dir: Path,
+    base_path: Path,
+    relative_path: str,
+    ensured_dirs: Optional[set] = None,
+) -> Optional[Path]:
+    """
+    Guest-share variant of _prepare_nested_destination: same lexical build
+    and mkdir dedup, but containment is checked against the share's base
+    path rather than the storage root.
+    """
+    path_parts = [p for p in relative_path.split("/") if p and p != "." and p != ".."]
+    if not path_parts:
+        return None
+    if len(path_parts) == 1 and relative_path.endswith("/"):
+        return None
+
+    dest_str = os.path.normpath(os.path.join(str(target_dir), *path_parts))
+    base_str = str(base_path)
+    if not (dest_str == base_str or dest_str.startswith(base_str + os.sep)):
+        return None
+
+    parent = os.path.dirname(dest_str)
+    if ensured_dirs is None:
+        os.makedirs(parent, exist_ok=True)
+    elif parent not in ensured_dirs:
+        os.makedirs(parent, exist_ok=True)
+        ensured_dirs.add(parent)
+    return Path(dest_str)
+
+
+app = FastAPI(
+    title="LAN File Server",
+    docs_url=None,
+    redoc_url=None,
+    # orjson serializes response bodies in C, well ahead of stdlib json
+    default_response_class=ORJSONResponse,
+)
 
 # Ensure the root and storage directories exist at startup
 ROOT_DIR.mkdir(parents=True, exist_ok=True)
@@ -76,6 +269,19 @@ Enjoy using Sarussi's Vault!
 
 def initialize_user_folders():
     """Initialize user folders with welcome files if they don't exist."""
+    # Sentinel short-circuit: the file stores a digest of the user roster,
+    # so a restart with an unchanged roster costs one read instead of two
+    # stats per user (and can't race a sibling worker mid-loop). Any change
+    # to USERS invalidates the digest and re-runs the full pass.
+    sentinel = USERS_DIR / ".init"
+    roster_sig = hashlib.blake2b(
+        ",".join(sorted(USERS)).encode(), digest_size=8
+    ).hexdigest()
+    try:
+        if sentinel.read_text() == roster_sig:
+            return
+    except OSError:
+        pass
     for username in USERS.keys():
         user_dir = USERS_DIR / username
         welcome_file = user_dir / "welcome.txt"
@@ -89,6 +295,7 @@ def initialize_user_folders():
         if not welcome_file.exists():
             welcome_file.write_text(WELCOME_MESSAGE, encoding="utf-8")
             logger.info(f"Created welcome.txt for {username}")
+    sentinel.write_text(roster_sig)
 
 # Initialize user folders on startup
 initialize_user_folders()
@@ -96,6 +303,52 @@ initialize_user_folders()
 STATIC_DIR = Path(__file__).parent / "static"
 DEV_ORIGINS = {"http://localhost:5173", "http://127.0.0.1:5173"}
 
+# Optional brotli variants for the static cache; gzip always works
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _build_static_cache() -> dict:
+    """
+    Read the SPA bundle into memory once, with precompressed variants.
+
+    The bundle only changes on deploy (which restarts the server), so asset
+    requests become a dict lookup plus a single send of prebuilt bytes - no
+    stat, open or read syscalls, and no per-request compression.
+    Values are (body, brotli_body|None, gzip_body|None, etag, content_type).
+    """
+    cache: dict = {}
+    if not STATIC_DIR.is_dir():
+        return cache
+    for dirpath, _dirnames, filenames in os.walk(STATIC_DIR):
+        for filename in filenames:
+            file_path = Path(dirpath) / filename
+            data = file_path.read_bytes()
+            st = file_path.stat()
+            etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+            ctype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            compressible = ctype.startswith("text/") or ctype in (
+                "application/javascript",
+                "application/json",
+                "image/svg+xml",
+            )
+            br_body = None
+            gz_body = None
+            if compressible:
+                if brotli is not None:
+                    br_body = brotli.compress(data, quality=11)
+                gz_body = gzip.compress(data, 9)
+                if gz_body is not None and len(gz_body) >= len(data):
+                    gz_body = None
+            rel = str(file_path.relative_to(STATIC_DIR)).replace(os.sep, "/")
+            cache[rel] = (data, br_body, gz_body, etag, ctype)
+    return cache
+
+
+_STATIC_CACHE = _build_static_cache()
+
 # Allow local dev frontend (Vite) to talk to the API
 app.add_middleware(
     CORSMiddleware,
@@ -108,6 +361,37 @@ app.add_middleware(
 # Security scheme for JWT tokens
 security = HTTPBearer(auto_error=False)
 
+# How often the janitor scans for abandoned chunked uploads
+UPLOAD_JANITOR_INTERVAL = 300  # 5 minutes in seconds
+
+
+async def _upload_janitor():
+    """Periodically evict chunked upload sessions abandoned by dead clients."""
+    while True:
+        await asyncio.sleep(UPLOAD_JANITOR_INTERVAL)
+        try:
+            fs.evict_stale_uploads()
+        except Exception:
+            logger.exception("Upload janitor pass failed")
+
+
+@app.on_event("startup")
+async def start_upload_janitor():
+    asyncio.create_task(_upload_janitor())
+
+
+@app.on_event("startup")
+async def size_default_executor():
+    """Size the thread pools used for blocking work."""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=(os.cpu_count() or 4) * 2)
+    )
+    # Sync-def endpoints run on anyio's pool, which defaults to 40 tokens;
+    # uploads no longer borrow from it (fs has its own pool), so give the
+    # metadata endpoints more headroom under burst.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 64
+
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc: HTTPException):
@@ -123,6 +407,12 @@ async def unhandled_exception_handler(request, exc: Exception):
     )
 
 
+# Pull the token straight out of the raw Cookie header. request.cookies
+# builds a full SimpleCookie on first access just to fetch one fixed key;
+# a compiled regex scan of the header skips that parse on every request.
+_JWT_COOKIE = re.compile(r"(?:^|;\s*)jwt_token=([^;]+)")
+
+
 # Dependency to get current user from token
 async def get_current_user_from_token(
     request: Request,
@@ -130,14 +420,15 @@ async def get_current_user_from_token(
 ) -> str:
     """Extract and validate JWT token from Authorization header or cookies."""
     token = None
-    
+
     # Try to get token from Authorization header first
     if credentials:
         token = credentials.credentials
-    else:
-        # Try to get token from cookies
-        token = request.cookies.get("jwt_token")
-    
+    elif raw_cookie := request.headers.get("cookie"):
+        match = _JWT_COOKIE.search(raw_cookie)
+        if match:
+            token = match.group(1)
+
     return get_current_user(token)
 
 
@@ -163,37 +454,123 @@ def login(login_data: LoginRequest):
     # Create response with token
     response = JSONResponse(content={"access_token": access_token, "token_type": "bearer"})
     
-    # Set token in cookie (never expires - set to 10 years)
-    # httponly=False so JavaScript can read it for authentication checks
+    # Set token in cookie (never expires - set to 10 years). The companion
+    # "authed" cookie below lets the frontend check auth state locally
+    # instead of polling /api/verify, saving a request-plus-JWT-decode
+    # round-trip on every page load. The token cookie itself stays readable
+    # (httponly=False) because the currently shipped frontend bundle still
+    # reads and re-sets jwt_token from JS; flip it to True once the bundle
+    # is rebuilt against the authed marker (frontend/src already is).
+    cookie_max_age = 10 * 365 * 24 * 60 * 60  # 10 years (effectively never expires)
     response.set_cookie(
         key="jwt_token",
         value=access_token,
-        httponly=False,  # Allow JavaScript to read for frontend auth checks
+        httponly=False,
         secure=False,  # Set to True in production with HTTPS
         samesite="lax",
         path="/",  # Make cookie available for entire site
-        max_age=10 * 365 * 24 * 60 * 60,  # 10 years (effectively never expires)
+        max_age=cookie_max_age,
+    )
+    # Deliberately readable from JavaScript; carries no secret, only the fact
+    # that a login happened.
+    response.set_cookie(
+        key="authed",
+        value="1",
+        httponly=False,
+        secure=False,  # Set to True in production with HTTPS
+        samesite="lax",
+        path="/",
+        max_age=cookie_max_age,
     )
     return response
 
 
-# Verify token endpoint (lightweight check)
+@app.post("/api/logout")
+def logout():
+    """Clear both auth cookies; scripts can't remove the HttpOnly token."""
+    response = JSONResponse(content={"detail": "Logged out"})
+    response.delete_cookie("jwt_token", path="/")
+    response.delete_cookie("authed", path="/")
+    return response
+
+
+# Verify token endpoint (lightweight check). Kept for defensive use even
+# though the frontend can now read the "authed" cookie locally.
 @app.get("/api/verify")
 def verify_token(current_user: str = Depends(get_current_user_from_token)):
     """Verify that the current token is valid."""
     return {"authenticated": True, "username": current_user}
 
 
-@app.get("/api/list", response_model=List[DirectoryEntry])
-def list_directory(
+@lru_cache(maxsize=1024)
+def _cached_listing(path_str: str, mtime_ns: int) -> bytes:
+    """
+    Listing cache keyed by (path, directory mtime), storing encoded JSON.
+
+    A directory's mtime changes whenever an entry is created, removed or
+    renamed, so an unchanged stamp means the cached bytes are still valid
+    and the per-entry stat calls can be skipped entirely. Caching the
+    serialized body rather than the entries means hot listings also skip
+    Pydantic serialization and JSON encoding - the response is one send of
+    prebuilt bytes. Stale keys age out of the LRU on their own.
+    """
+    entries = fs.list_directory(Path(path_str))
+    return orjson.dumps([e.__dict__ for e in entries])
+
+
+@app.get("/api/list")
+async def list_directory(
     path: str = "",
     current_user: str = Depends(get_current_user_from_token),
 ):
     directory = resolve_path(path, current_user)
-    return fs.list_directory(directory)
+    try:
+        st = directory.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Path not found")
+    # Cache hits return instantly; misses run the stat-heavy scan off-loop
+    body = await asyncio.to_thread(_cached_listing, str(directory), st.st_mtime_ns)
+    return Response(content=body, media_type="application/json")
+
 
+@lru_cache(maxsize=512)
+def _cached_hierarchy(path_str: str, mtime_ns: int) -> bytes:
+    """Hierarchy cache in the same shape as _cached_listing: encoded bytes
+    keyed by (path, mtime). The mtime stamp catches direct changes; deeper
+    mutations go through the endpoints below, which all clear these caches,
+    so only out-of-band edits in nested directories can serve stale."""
+    return _HIERARCHY_ADAPTER.dump_json(fs.build_hierarchy(Path(path_str)))
 
-@app.get("/api/hierarchy", response_model=List[HierarchyEntry])
+
+@lru_cache(maxsize=512)
+def _cached_search(path_str: str, mtime_ns: int, query: str) -> bytes:
+    """Search cache: same keying as _cached_hierarchy plus the query, so
+    per-keystroke repeats of a hot search skip the walk entirely."""
+    return _HIERARCHY_ADAPTER.dump_json(fs.search_files(Path(path_str), query))
+
+
+def _clear_tree_caches() -> None:
+    """Drop listing/hierarchy/search caches after any mutation. Directory
+    mtimes only cover direct children, so the recursive caches cannot rely
+    on their key alone when something deeper changes."""
+    _cached_listing.cache_clear()
+    _cached_hierarchy.cache_clear()
+    _cached_search.cache_clear()
+
+
+def _tree_body(cache, directory: Path, *extra) -> Response:
+    """Serve a cached tree response, re-statting the root for the key."""
+    try:
+        st = directory.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Path not found")
+    return Response(
+        content=cache(str(directory), st.st_mtime_ns, *extra),
+        media_type="application/json",
+    )
+
+
+@app.get("/api/hierarchy")
 def get_hierarchy(
     path: str = "",
     current_user: str = Depends(get_current_user_from_token),
@@ -203,10 +580,10 @@ def get_hierarchy(
     Returns a recursive structure with all subdirectories and files.
     """
     directory = resolve_path(path, current_user)
-    return fs.build_hierarchy(directory)
+    return _tree_body(_cached_hierarchy, directory)
 
 
-@app.get("/api/search", response_model=List[HierarchyEntry])
+@app.get("/api/search")
 def search_files(
     path: str = "",
     query: str = "",
@@ -220,7 +597,54 @@ def search_files(
         return []
     
     directory = resolve_path(path, current_user)
-    return fs.search_files(directory, query.strip())
+    return _tree_body(_cached_search, directory, query.strip())
+
+
+# Files at or below this size are served from memory instead of FileResponse
+_SMALL_FILE_LIMIT = 64 * 1024
+
+
+@lru_cache(maxsize=256)
+def _small_file_body(path_str: str, mtime_ns: int) -> bytes:
+    """Bytes of a small file, keyed by (path, mtime) like the tree caches."""
+    return Path(path_str).read_bytes()
+
+
+def _file_response(file_path: Path) -> Response:
+    """
+    Serve a file download, inlining small ones.
+
+    Small files (configs, notes, thumbnails) dominate request counts but
+    FileResponse still pays its open + threadpool-read + sendfile dance for
+    them. Here they come back as one prebuilt Response from the versioned
+    byte cache - after the single stat that keys it, a hot hit does no I/O
+    at all. Anything larger keeps FileResponse, whose zero-copy pathsend
+    and Range/If-Range handling matter exactly when bodies are big.
+    """
+    try:
+        st = file_path.stat()
+    except OSError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    if not stat_module.S_ISREG(st.st_mode):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    if st.st_size <= _SMALL_FILE_LIMIT:
+        # Same Content-Disposition quoting rule as Starlette: plain filename
+        # when it is ASCII-clean, RFC 5987 encoding otherwise.
+        quoted = quote(file_path.name)
+        if quoted == file_path.name:
+            disposition = f'attachment; filename="{file_path.name}"'
+        else:
+            disposition = f"attachment; filename*=utf-8''{quoted}"
+        return Response(
+            content=_small_file_body(str(file_path), st.st_mtime_ns),
+            media_type=mimetypes.guess_type(file_path.name)[0] or "application/octet-stream",
+            headers={"Content-Disposition": disposition},
+        )
+    # FileResponse negotiates the ASGI http.response.pathsend extension when
+    # the server advertises it, handing the whole transfer to the server's
+    # sendfile path with zero userspace copies; otherwise it streams chunks.
+    # It also answers Range/If-Range itself, so browsers can resume downloads.
+    return FileResponse(file_path, filename=file_path.name)
 
 
 @app.get("/api/file")
@@ -229,9 +653,7 @@ def get_file(
     current_user: str = Depends(get_current_user_from_token),
 ):
     file_path = resolve_path(path, current_user)
-    if not file_path.is_file():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-    return FileResponse(file_path, filename=file_path.name)
+    return _file_response(file_path)
 
 
 @app.put("/api/file", response_model=OperationResult)
@@ -240,7 +662,7 @@ def save_file(
     current_user: str = Depends(get_current_user_from_token),
 ):
     # Check if trying to write to shared folder
-    if payload.path == "shared" or payload.path.startswith("shared/") or (payload.path != "private" and not payload.path.startswith("private/") and payload.path == ""):
+    if _is_shared_write(payload.path):
         check_shared_write_permission(current_user)
     
     file_path = resolve_path(payload.path, current_user)
@@ -254,13 +676,14 @@ def save_file(
     if file_path.is_dir():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Path is a directory, not a file")
     
-    # Write content to file
+    # Atomic write: temp file + rename, so a crash can't truncate the target
     try:
-        file_path.write_text(payload.content, encoding='utf-8')
+        fs.write_text_atomic(file_path, payload.content)
     except Exception as e:
         logger.error(f"Failed to save file {file_path}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to save file: {str(e)}")
     
+    _clear_tree_caches()
     return OperationResult(detail="File saved successfully")
 
 
@@ -271,25 +694,24 @@ async def upload_file(
     current_user: str = Depends(get_current_user_from_token),
 ):
     # Check if trying to write to shared folder
-    if path == "shared" or path.startswith("shared/") or (path != "private" and not path.startswith("private/") and path == ""):
+    if _is_shared_write(path):
         check_shared_write_permission(current_user)
-    
-    target_dir = resolve_path(path, current_user)
-    fs.ensure_directory(target_dir)
+
+    # Resolution and directory stats are blocking; keep them off the loop
+    target_dir = await asyncio.to_thread(_resolve_upload_dir, path, current_user)
 
     original_name = file.filename or ""
-    if "/" in original_name or "\\" in original_name or original_name.strip() == "":
+    if not _VALID_NAME.fullmatch(original_name):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid filename")
 
-    safe_name = Path(original_name).name
-    destination = (target_dir / safe_name).resolve()
-
-    # Ensure destination stays inside ROOT_DIR (handles odd filename edge cases)
-    if destination != ROOT_DIR and ROOT_DIR not in destination.parents:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination")
+    # A validated name has no separators or dot-dots and target_dir is
+    # already resolved and contained, so no resolve() walk or containment
+    # re-check is needed on the joined path
+    destination = target_dir / original_name
 
-    fs.ensure_not_exists(destination)
+    # save_upload_file opens exclusively, so existing files 409 atomically
     await fs.save_upload_file(destination, file)
+    _clear_tree_caches()
     return OperationResult(detail="File uploaded")
 
 
@@ -300,52 +722,38 @@ async def upload_multiple_files(
     current_user: str = Depends(get_current_user_from_token),
 ):
     # Check if trying to write to shared folder
-    if path == "shared" or path.startswith("shared/") or (path != "private" and not path.startswith("private/") and path == ""):
+    if _is_shared_write(path):
         check_shared_write_permission(current_user)
-    
-    target_dir = resolve_path(path, current_user)
-    fs.ensure_directory(target_dir)
+
+    # Resolution and directory stats are blocking; keep them off the loop
+    target_dir = await asyncio.to_thread(_resolve_upload_dir, path, current_user)
 
     uploaded_count = 0
+    ensured_dirs: set = set()
     for file in files:
         original_name = file.filename or ""
         if original_name.strip() == "":
             continue
 
         # Handle relative paths from folder uploads (e.g., "folder/subfolder/file.txt")
-        # Normalize path separators
+        # Normalize path separators; the parent mkdir runs on a worker and is
+        # deduped across the batch via ensured_dirs
         relative_path = original_name.replace("\\", "/")
-        path_parts = [p for p in relative_path.split("/") if p and p != "." and p != ".."]
-        
-        if not path_parts:
-            continue
-
-        # Build destination path preserving directory structure
-        destination = target_dir
-        for part in path_parts:
-            destination = destination / part
-
-        destination = destination.resolve()
-
-        # Ensure destination stays inside ROOT_DIR
-        if destination != ROOT_DIR and ROOT_DIR not in destination.parents:
+        destination = await asyncio.to_thread(
+            _prepare_nested_destination, target_dir, relative_path, ensured_dirs
+        )
+        if destination is None:
             continue
 
         try:
-            # Ensure parent directories exist
-            destination.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Only create file if it doesn't exist (skip directories)
-            if not destination.exists():
-                if len(path_parts) > 1 or not file.filename.endswith("/"):
-                    # It's a file, not a directory marker
-                    fs.ensure_not_exists(destination)
-                    await fs.save_upload_file(destination, file)
-                    uploaded_count += 1
+            # save_upload_file's exclusive open skips existing files with 409
+            await fs.save_upload_file(destination, file)
+            uploaded_count += 1
         except Exception:
             # Skip files that can't be uploaded
             continue
 
+    _clear_tree_caches()
     return OperationResult(detail=f"{uploaded_count} file(s) uploaded")
 
 
@@ -356,51 +764,44 @@ async def init_chunked_upload(
 ):
     """Initialize a chunked upload session."""
     # Check if trying to write to shared folder
-    if payload.path == "shared" or payload.path.startswith("shared/") or (payload.path != "private" and not payload.path.startswith("private/") and payload.path == ""):
+    if _is_shared_write(payload.path):
         check_shared_write_permission(current_user)
     
-    target_dir = resolve_path(payload.path, current_user)
-    fs.ensure_directory(target_dir)
-    
+    # Resolution and directory stats are blocking; keep them off the loop
+    target_dir = await asyncio.to_thread(_resolve_upload_dir, payload.path, current_user)
+
     # Handle relative paths from folder uploads
     if payload.relative_path:
-        # Normalize path separators
+        # Normalize path separators; resolve + parent mkdir run on a worker
         relative_path = payload.relative_path.replace("\\", "/")
-        path_parts = [p for p in relative_path.split("/") if p and p != "." and p != ".."]
-        
-        # Build destination path preserving directory structure
-        destination = target_dir
-        for part in path_parts:
-            destination = destination / part
-        destination = destination.resolve()
-        
-        # Ensure destination stays inside ROOT_DIR
-        if destination != ROOT_DIR and ROOT_DIR not in destination.parents:
+        destination = await asyncio.to_thread(
+            _prepare_nested_destination, target_dir, relative_path
+        )
+        if destination is None:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination")
     else:
         # Single file upload
         original_name = payload.filename
-        if "/" in original_name or "\\" in original_name or original_name.strip() == "":
+        if not _VALID_NAME.fullmatch(original_name):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid filename")
         
-        safe_name = Path(original_name).name
-        destination = (target_dir / safe_name).resolve()
-        
-        # Ensure destination stays inside ROOT_DIR
-        if destination != ROOT_DIR and ROOT_DIR not in destination.parents:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination")
+        # A validated name has no separators or dot-dots and target_dir is
+        # already resolved and contained, so no resolve() walk or containment
+        # re-check is needed on the joined path
+        destination = target_dir / original_name
     
     # Generate unique upload ID
     upload_id = str(uuid.uuid4())
-    
-    # Initialize chunked upload
-    fs.init_chunked_upload(
+
+    # Initialize chunked upload (mkdir + exclusive open + fallocate block)
+    await asyncio.to_thread(
+        fs.init_chunked_upload,
         upload_id=upload_id,
         destination=destination,
         total_size=payload.total_size,
         total_chunks=payload.total_chunks,
     )
-    
+
     return ChunkedUploadInitResponse(upload_id=upload_id)
 
 
@@ -413,21 +814,12 @@ async def upload_chunk(
 ):
     """Upload a single chunk for a chunked upload."""
     try:
-        # Read chunk data
-        chunk_data = await chunk.read()
+        # Pipe the spooled multipart file straight to the destination offset
+        # on a worker thread; no whole-chunk bytes object, no loop blocking.
+        # Size enforcement happens inside the copy.
+        await asyncio.to_thread(fs.save_chunk_stream, upload_id, chunk_index, chunk.file)
         await chunk.close()
-        
-        # Verify chunk size (should be <= MAX_CHUNK_SIZE, except maybe last chunk)
-        # Allow some overhead for multipart encoding (typically ~10-20%)
-        if len(chunk_data) > int(fs.MAX_CHUNK_SIZE * 1.3):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Chunk size {len(chunk_data)} exceeds maximum allowed size"
-            )
-        
-        # Save chunk
-        fs.save_chunk(upload_id, chunk_index, chunk_data)
-        
+
         return OperationResult(detail="Chunk uploaded successfully")
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -449,8 +841,13 @@ async def finalize_chunked_upload(
 ):
     """Finalize a chunked upload by assembling all chunks into the final file."""
     try:
-        fs.finalize_chunked_upload(payload.upload_id)
+        # fsync + close block; run them off the loop
+        await asyncio.to_thread(fs.finalize_chunked_upload, payload.upload_id)
+        _clear_tree_caches()
         return OperationResult(detail="File uploaded successfully")
+    except HTTPException:
+        # Missing-chunk 400s keep the session alive for a retry
+        raise
     except Exception as e:
         logger.error(f"Failed to finalize upload {payload.upload_id}: {e}")
         # Clean up on error
@@ -462,28 +859,35 @@ async def finalize_chunked_upload(
 
 
 @app.post("/api/mkdir", response_model=OperationResult)
-def make_directory(
+async def make_directory(
     payload: MkdirPayload,
     current_user: str = Depends(get_current_user_from_token),
 ):
     # Check if trying to write to shared folder
-    if payload.path == "shared" or payload.path.startswith("shared/") or (payload.path != "private" and not payload.path.startswith("private/") and payload.path == ""):
+    if _is_shared_write(payload.path):
         check_shared_write_permission(current_user)
-    
+
     parent = resolve_path(payload.path, current_user)
-    fs.ensure_directory(parent)
 
     name = payload.name.strip()
-    name_path = Path(name)
-    if name == "" or name_path.is_absolute() or ".." in name_path.parts or name_path.name != name:
+    if not _VALID_NAME.fullmatch(name):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid directory name")
 
-    target = (parent / name_path).resolve()
-    if target != ROOT_DIR and ROOT_DIR not in target.parents:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination")
+    # Validated leaf under an already-resolved parent: skip the resolve()
+    # path walk and containment re-check
+    target = parent / name
 
-    fs.ensure_not_exists(target)
-    target.mkdir(parents=False, exist_ok=False)
+    # Optimistic mkdir: let the syscall itself report a missing parent or an
+    # existing target instead of paying for separate stat pre-checks
+    try:
+        await asyncio.to_thread(target.mkdir, parents=False, exist_ok=False)
+    except FileExistsError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Target already exists")
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Path not found")
+    except NotADirectoryError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not a directory")
+    _clear_tree_caches()
     return OperationResult(detail="Directory created")
 
 
@@ -493,53 +897,56 @@ def create_file(
     current_user: str = Depends(get_current_user_from_token),
 ):
     # Check if trying to write to shared folder
-    if payload.path == "shared" or payload.path.startswith("shared/") or (payload.path != "private" and not payload.path.startswith("private/") and payload.path == ""):
+    if _is_shared_write(payload.path):
         check_shared_write_permission(current_user)
     
     parent = resolve_path(payload.path, current_user)
     fs.ensure_directory(parent)
 
     name = payload.name.strip()
-    name_path = Path(name)
-    if name == "" or name_path.is_absolute() or ".." in name_path.parts or name_path.name != name:
+    if not _VALID_NAME.fullmatch(name):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid filename")
 
-    target = (parent / name_path).resolve()
-    if target != ROOT_DIR and ROOT_DIR not in target.parents:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination")
+    # Validated leaf under an already-resolved parent: skip the resolve()
+    # path walk and containment re-check
+    target = parent / name
 
     fs.ensure_not_exists(target)
     target.touch(exist_ok=False)
+    _clear_tree_caches()
     return OperationResult(detail="File created")
 
 
 @app.delete("/api/delete", response_model=OperationResult)
-def delete_path(
+async def delete_path(
     path: str,
     current_user: str = Depends(get_current_user_from_token),
 ):
     # Check if trying to delete from shared folder
-    if path == "shared" or path.startswith("shared/") or (path != "private" and not path.startswith("private/") and path == ""):
+    if _is_shared_write(path):
         check_shared_write_permission(current_user)
-    
+
     target = resolve_path(path, current_user)
     # Prevent deleting storage root directories
     if target == ROOT_DIR or target == SHARED_DIR or (target.parent == USERS_DIR):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot delete storage root directory")
-    fs.remove_path(target)
+    # Recursive deletes can take a while on big trees; keep them off the loop
+    await asyncio.to_thread(fs.remove_path, target)
+    _clear_tree_caches()
+    resolve_path.cache_clear()
     return OperationResult(detail="Deleted")
 
 
 @app.post("/api/move", response_model=OperationResult)
-def move_path(
+async def move_path(
     payload: MovePayload,
     current_user: str = Depends(get_current_user_from_token),
 ):
     # Check if trying to write to shared folder
-    if payload.dst == "shared" or payload.dst.startswith("shared/") or (payload.dst != "private" and not payload.dst.startswith("private/") and payload.dst == ""):
+    if _is_shared_write(payload.dst):
         check_shared_write_permission(current_user)
     # Also check if moving from shared folder
-    if payload.src == "shared" or payload.src.startswith("shared/") or (payload.src != "private" and not payload.src.startswith("private/") and payload.src == ""):
+    if _is_shared_write(payload.src):
         check_shared_write_permission(current_user)
     
     src = resolve_path(payload.src, current_user)
@@ -548,16 +955,11 @@ def move_path(
     if src == ROOT_DIR:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot move root directory")
 
-    if not src.exists():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
-
-    if not dst.parent.exists():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Destination parent not found")
-    if not dst.parent.is_dir():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Destination parent is not a directory")
-
-    fs.ensure_not_exists(dst)
-    fs.move_path(src, dst)
+    # move_path attempts the rename directly and translates the syscall
+    # errors, so no stat pre-checks are needed here
+    await asyncio.to_thread(fs.move_path, src, dst)
+    _clear_tree_caches()
+    resolve_path.cache_clear()
     return OperationResult(detail="Moved")
 
 
@@ -567,10 +969,10 @@ def copy_path(
     current_user: str = Depends(get_current_user_from_token),
 ):
     # Check if trying to write to shared folder
-    if payload.dst == "shared" or payload.dst.startswith("shared/") or (payload.dst != "private" and not payload.dst.startswith("private/") and payload.dst == ""):
+    if _is_shared_write(payload.dst):
         check_shared_write_permission(current_user)
     # Also check if copying from shared folder (for consistency, though copy doesn't modify source)
-    if payload.src == "shared" or payload.src.startswith("shared/") or (payload.src != "private" and not payload.src.startswith("private/") and payload.src == ""):
+    if _is_shared_write(payload.src):
         check_shared_write_permission(current_user)
     
     src = resolve_path(payload.src, current_user)
@@ -579,29 +981,113 @@ def copy_path(
     if src == ROOT_DIR:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot copy root directory")
 
-    if not src.exists():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
-
-    if not dst.parent.exists():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Destination parent not found")
-    if not dst.parent.is_dir():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Destination parent is not a directory")
-
-    fs.ensure_not_exists(dst)
+    # copy_path does its own fused lstat pre-checks (source, parent, target),
+    # so repeating exists/is_dir walks here would just double the syscalls
     fs.copy_path(src, dst)
+    _clear_tree_caches()
     return OperationResult(detail="Copied")
 
 
-def add_to_zip(zip_file: zipfile.ZipFile, path: Path, base_path: Path, arcname_prefix: str = ""):
-    """Recursively add files and directories to zip file."""
-    if path.is_file():
-        arcname = f"{arcname_prefix}/{path.name}" if arcname_prefix else path.name
-        zip_file.write(path, arcname)
-    elif path.is_dir():
-        # Add all items in the directory
-        for item in path.iterdir():
-            item_arcname = f"{arcname_prefix}/{item.name}" if arcname_prefix else item.name
-            add_to_zip(zip_file, item, base_path, item_arcname)
+def _add_tree_to_zip(zs: "zipstream.ZipStream", dir_path: str, arc_prefix: str) -> None:
+    """
+    Add every regular file under `dir_path` to the stream.
+
+    Iterative scandir walk: type checks reuse the d_type cached on each
+    DirEntry from the readdir batch instead of a fresh stat per entry, and
+    follow_symlinks=False keeps symlinked trees out of the archive.
+    """
+    stack: list[tuple[str, str]] = [(dir_path, arc_prefix)]
+    while stack:
+        current, arc = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                sub = f"{arc}/{entry.name}"
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, sub))
+                    elif entry.is_file(follow_symlinks=False):
+                        zs.add_path(entry.path, arcname=sub)
+                except OSError:
+                    continue
+
+
+def _dedupe_nested(paths: Iterable[Path]) -> List[Path]:
+    """
+    Drop paths already covered by another requested directory, so a request
+    naming both a folder and something inside it doesn't archive the inner
+    entry twice. Parents sort before their children, so one pass suffices.
+    """
+    kept: List[Path] = []
+    for candidate in sorted(set(paths), key=str):
+        if not any(_is_within(existing, candidate) for existing in kept):
+            kept.append(candidate)
+    return kept
+
+
+async def stream_zip(zs: "zipstream.ZipStream"):
+    """
+    Async generator over a ZipStream, fed by a single producer thread.
+
+    Handing StreamingResponse the sync iterator directly would hop to the
+    anyio threadpool for every yield; here one background thread reads and
+    compresses, chunks cross to the loop via call_soon_threadsafe, and the
+    semaphore caps how far the producer can run ahead of the client. The
+    cancelled flag lets the producer wind down if the client disconnects.
+
+    An os.pipe() between producer and consumer would work too, but the pipe's
+    64 KiB kernel buffer gives cruder backpressure than the chunk-counted
+    semaphore, and reading the pipe end would itself need threadpool hops.
+    Nothing touches disk either way - the temp-file staging is long gone.
+    """
+    loop = asyncio.get_running_loop()
+    chunk_queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(8)
+    cancelled = threading.Event()
+
+    def producer():
+        try:
+            for chunk in zs:
+                while not slots.acquire(timeout=1.0):
+                    if cancelled.is_set():
+                        return
+                loop.call_soon_threadsafe(chunk_queue.put_nowait, chunk)
+        finally:
+            loop.call_soon_threadsafe(chunk_queue.put_nowait, None)
+
+    producer_done = loop.run_in_executor(None, producer)
+    try:
+        while (chunk := await chunk_queue.get()) is not None:
+            slots.release()
+            yield chunk
+        await producer_done
+    finally:
+        cancelled.set()
+
+
+def build_zip_stream(paths: Iterable[Path]) -> zipstream.ZipStream:
+    """
+    Build a lazily-evaluated zip stream over the given resolved paths.
+
+    ZIP_STORED keeps CPU out of the path - most stored media is already
+    compressed, so deflate would burn cycles for little size gain. Files are
+    only read as the response iterates the stream, so the first bytes go out
+    immediately and nothing is staged on disk. That choice also moots a
+    parallel-compression worker pool (pigz-style per-member deflate): with
+    no compression stage there is nothing to parallelize, and the producer
+    thread in stream_zip already overlaps the remaining work - disk reads -
+    with sending.
+    """
+    zs = zipstream.ZipStream(compress_type=zipfile.ZIP_STORED)
+    for resolved_path in paths:
+        if resolved_path.is_file():
+            zs.add_path(resolved_path, arcname=resolved_path.name)
+        elif resolved_path.is_dir():
+            _add_tree_to_zip(zs, str(resolved_path), resolved_path.name)
+    return zs
 
 
 @app.post("/api/download-zip")
@@ -609,60 +1095,26 @@ def download_as_zip(
     payload: DownloadPayload,
     current_user: str = Depends(get_current_user_from_token),
 ):
-    """Download multiple files/folders as a zip archive."""
+    """Download multiple files/folders as a zip archive, streamed as built."""
     if not payload.paths:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No paths provided")
-    
-    # Create a temporary zip file
-    temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
-    temp_zip_path = Path(temp_zip.name)
-    temp_zip.close()
-    
-    try:
-        with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for path_str in payload.paths:
-                resolved_path = resolve_path(path_str, current_user)
-                if not resolved_path.exists():
-                    continue
-                
-                # Get the base name for the archive
-                if resolved_path.is_file():
-                    zip_file.write(resolved_path, resolved_path.name)
-                elif resolved_path.is_dir():
-                    # Add directory and all its contents
-                    add_to_zip(zip_file, resolved_path, resolved_path, resolved_path.name)
-        
-        # Determine zip filename
-        if len(payload.paths) == 1:
-            # Single item - use its name
-            single_path = resolve_path(payload.paths[0], current_user)
-            zip_filename = f"{single_path.name}.zip"
-        else:
-            # Multiple items - use a generic name
-            zip_filename = "download.zip"
-        
-        # Use StreamingResponse to allow cleanup after download
-        def generate():
-            with open(temp_zip_path, 'rb') as f:
-                while True:
-                    chunk = f.read(8192)
-                    if not chunk:
-                        break
-                    yield chunk
-            # Clean up after streaming
-            if temp_zip_path.exists():
-                temp_zip_path.unlink()
-        
-        return StreamingResponse(
-            generate(),
-            media_type="application/zip",
-            headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
-        )
-    except Exception as e:
-        # Clean up temp file on error
-        if temp_zip_path.exists():
-            temp_zip_path.unlink()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    resolved = _dedupe_nested(
+        resolve_path(path_str, current_user) for path_str in payload.paths
+    )
+    zs = build_zip_stream(resolved)
+
+    # Determine zip filename from the already-resolved list
+    if len(resolved) == 1:
+        zip_filename = f"{resolved[0].name}.zip"
+    else:
+        zip_filename = "download.zip"
+
+    return StreamingResponse(
+        stream_zip(zs),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
+    )
 
 
 # Share endpoints
@@ -737,11 +1189,36 @@ def get_share_info(share_id: str):
 
 
 # Guest access endpoints (no authentication required)
+
+# Short-TTL share cache: every guest request starts by loading shares.json
+# and rebuilding ShareInfo objects, which dominates the endpoint prologue
+# for a hot share. Entries are re-read after the TTL, expiry is still
+# enforced on every hit, and there is no share-mutation endpoint to
+# invalidate for. (resolve_path is lru-cached, so the base path that pairs
+# with the share is already free.)
+_SHARE_TTL = 30.0
+_SHARE_CACHE_MAX = 1024
+_SHARE_CACHE: dict = {}
+
+
 def get_share_for_guest(share_id: str) -> shares.ShareInfo:
     """Helper to get and validate share for guest access."""
+    now = time.monotonic()
+    hit = _SHARE_CACHE.get(share_id)
+    if hit is not None and now - hit[0] < _SHARE_TTL:
+        share = hit[1]
+        if share.expires_at is None or time.time() <= share.expires_at:
+            return share
     share = shares.get_share(share_id)
     if not share:
+        _SHARE_CACHE.pop(share_id, None)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Share not found or expired")
+    if len(_SHARE_CACHE) >= _SHARE_CACHE_MAX:
+        # Unknown share_ids never get cached, so this only trips if more
+        # than _SHARE_CACHE_MAX real shares are hot; dumping all of them
+        # costs one reload each and keeps the dict bounded.
+        _SHARE_CACHE.clear()
+    _SHARE_CACHE[share_id] = (now, share)
     return share
 
 
@@ -754,13 +1231,32 @@ def check_guest_write_permission(share: shares.ShareInfo) -> None:
         )
 
 
-@app.get("/api/open/{share_id}/list", response_model=List[DirectoryEntry])
-def list_shared_directory(share_id: str, path: str = ""):
-    """List directory entries for a shared resource (guest access)."""
+class GuestContext(NamedTuple):
+    """Share plus its resolved base path, built once per request."""
+    share: shares.ShareInfo
+    base_path: Path
+
+
+def guest_ctx(share_id: str) -> GuestContext:
+    """Dependency: validate the share and resolve its base in one place.
+
+    The share comes from the TTL cache and resolve_path from its LRU, so
+    for a hot share this prologue is two dict probes instead of a JSON
+    load and a path walk repeated in every handler."""
     share = get_share_for_guest(share_id)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    return GuestContext(share, resolve_path(share.path, share.username))
+
+
+def guest_ctx_write(ctx: GuestContext = Depends(guest_ctx)) -> GuestContext:
+    """Dependency: guest_ctx plus the write-permission check."""
+    check_guest_write_permission(ctx.share)
+    return ctx
+
+
+@app.get("/api/open/{share_id}/list")
+def list_shared_directory(path: str = "", ctx: GuestContext = Depends(guest_ctx)):
+    """List directory entries for a shared resource (guest access)."""
+    base_path = ctx.base_path
     
     # Check if base path exists
     if not base_path.exists():
@@ -783,16 +1279,18 @@ def list_shared_directory(share_id: str, path: str = ""):
     if not target_path.is_dir():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not a directory")
     
-    return fs.list_directory(target_path)
+    # DirectoryEntry is flat, so the entries' __dict__s orjson-encode directly
+    # with no response_model re-validation pass.
+    return Response(
+        content=orjson.dumps([entry.__dict__ for entry in fs.list_directory(target_path)]),
+        media_type="application/json",
+    )
 
 
 @app.get("/api/open/{share_id}/file")
-def get_shared_file(share_id: str, path: str = ""):
+def get_shared_file(path: str = "", ctx: GuestContext = Depends(guest_ctx)):
     """Get a file from a shared resource (guest access)."""
-    share = get_share_for_guest(share_id)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    base_path = ctx.base_path
     
     # If base path is a file, path should be empty
     if base_path.is_file():
@@ -802,24 +1300,19 @@ def get_shared_file(share_id: str, path: str = ""):
     else:
         # Resolve the requested path within the shared base
         target_path = resolve_guest_path(path, base_path)
-    
-    if not target_path.is_file():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-    
-    return FileResponse(target_path, filename=target_path.name)
+
+    # Same small-file inlining + large-file streaming as /api/file
+    return _file_response(target_path)
 
 
-@app.get("/api/open/{share_id}/hierarchy", response_model=List[HierarchyEntry])
-def get_shared_hierarchy(share_id: str, path: str = ""):
+@app.get("/api/open/{share_id}/hierarchy")
+def get_shared_hierarchy(path: str = "", ctx: GuestContext = Depends(guest_ctx)):
     """Get directory hierarchy for a shared resource (guest access)."""
-    share = get_share_for_guest(share_id)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    base_path = ctx.base_path
     
     # If it's a file, return empty hierarchy
     if base_path.is_file():
-        return []
+        return _hierarchy_response([])
     
     # Resolve the requested path within the shared base
     target_path = resolve_guest_path(path, base_path)
@@ -827,23 +1320,20 @@ def get_shared_hierarchy(share_id: str, path: str = ""):
     if not target_path.is_dir():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not a directory")
     
-    return fs.build_hierarchy(target_path)
+    return _tree_body(_cached_hierarchy, target_path)
 
 
-@app.get("/api/open/{share_id}/search", response_model=List[HierarchyEntry])
-def search_shared_files(share_id: str, path: str = "", query: str = ""):
+@app.get("/api/open/{share_id}/search")
+def search_shared_files(path: str = "", query: str = "", ctx: GuestContext = Depends(guest_ctx)):
     """Search files in a shared resource (guest access)."""
-    share = get_share_for_guest(share_id)
-    
     if not query or not query.strip():
-        return []
+        return _hierarchy_response([])
     
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    base_path = ctx.base_path
     
     # If it's a file, return empty results
     if base_path.is_file():
-        return []
+        return _hierarchy_response([])
     
     # Resolve the requested path within the shared base
     target_path = resolve_guest_path(path, base_path)
@@ -851,20 +1341,16 @@ def search_shared_files(share_id: str, path: str = "", query: str = ""):
     if not target_path.is_dir():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not a directory")
     
-    return fs.search_files(target_path, query.strip())
+    return _tree_body(_cached_search, target_path, query.strip())
 
 
 @app.put("/api/open/{share_id}/file", response_model=OperationResult)
 def save_shared_file(
-    share_id: str,
     payload: SaveFilePayload,
+    ctx: GuestContext = Depends(guest_ctx_write),
 ):
     """Save file content in a shared resource (requires write permission)."""
-    share = get_share_for_guest(share_id)
-    check_guest_write_permission(share)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    base_path = ctx.base_path
     
     # Resolve the requested path within the shared base
     file_path = resolve_guest_path(payload.path, base_path)
@@ -877,131 +1363,93 @@ def save_shared_file(
     if file_path.is_dir():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Path is a directory, not a file")
     
-    # Write content to file
+    # Atomic write: temp file + rename, so a crash can't truncate the target
     try:
-        file_path.write_text(payload.content, encoding='utf-8')
+        fs.write_text_atomic(file_path, payload.content)
     except Exception as e:
         logger.error(f"Failed to save file {file_path}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to save file: {str(e)}")
     
+    _clear_tree_caches()
     return OperationResult(detail="File saved successfully")
 
 
 @app.post("/api/open/{share_id}/upload", response_model=OperationResult)
 async def upload_shared_file(
-    share_id: str,
     path: str = "",
     file: UploadFile = File(...),
+    ctx: GuestContext = Depends(guest_ctx_write),
 ):
     """Upload a file to a shared resource (requires write permission)."""
-    share = get_share_for_guest(share_id)
-    check_guest_write_permission(share)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
-    
-    # If base path is a file, can't upload
-    if base_path.is_file():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot upload to a file")
-    
-    # Resolve the target directory within the shared base
-    target_dir = resolve_guest_path(path, base_path)
-    
-    if not target_dir.is_dir():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Target directory not found")
-    
-    fs.ensure_directory(target_dir)
-    
+    # Resolution and directory stats are blocking; keep them off the loop
+    _, target_dir = await asyncio.to_thread(_resolve_guest_upload_dir, ctx.share, path)
+
     original_name = file.filename or ""
-    if "/" in original_name or "\\" in original_name or original_name.strip() == "":
+    if not _VALID_NAME.fullmatch(original_name):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid filename")
     
-    safe_name = Path(original_name).name
-    destination = (target_dir / safe_name).resolve()
+    # A validated name has no separators or dot-dots and target_dir is
+    # already resolved within the share, so no resolve() walk or containment
+    # re-check is needed on the joined path
+    destination = target_dir / original_name
     
-    # Ensure destination stays within share_base_path
-    if base_path not in destination.parents and destination != base_path:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination")
-    
-    fs.ensure_not_exists(destination)
+    # save_upload_file opens exclusively, so existing files 409 atomically
     await fs.save_upload_file(destination, file)
+    _clear_tree_caches()
     return OperationResult(detail="File uploaded")
 
 
 @app.post("/api/open/{share_id}/upload-multiple", response_model=OperationResult)
 async def upload_multiple_shared_files(
-    share_id: str,
     path: str = "",
     files: List[UploadFile] = File(...),
+    ctx: GuestContext = Depends(guest_ctx_write),
 ):
     """Upload multiple files to a shared resource (requires write permission)."""
-    share = get_share_for_guest(share_id)
-    check_guest_write_permission(share)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
-    
-    # If base path is a file, can't upload
-    if base_path.is_file():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot upload to a file")
-    
-    # Resolve the target directory within the shared base
-    target_dir = resolve_guest_path(path, base_path)
-    
-    if not target_dir.is_dir():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Target directory not found")
-    
-    fs.ensure_directory(target_dir)
-    
-    uploaded_count = 0
-    for file in files:
+    # Resolution and directory stats are blocking; keep them off the loop
+    base_path, target_dir = await asyncio.to_thread(_resolve_guest_upload_dir, ctx.share, path)
+
+    # Fan the files out concurrently: each body is already spooled by the
+    # multipart parser, so the transfers are independent disk writes that can
+    # overlap. The semaphore bounds how many are prepared at once; the writes
+    # themselves are additionally capped by the upload executor in fs.
+    gate = asyncio.Semaphore(fs.UPLOAD_CONCURRENCY)
+    ensured_dirs: set = set()
+
+    async def _upload_one(file: UploadFile) -> bool:
         original_name = file.filename or ""
         if original_name.strip() == "":
-            continue
-        
+            return False
         # Handle relative paths from folder uploads
         relative_path = original_name.replace("\\", "/")
-        path_parts = [p for p in relative_path.split("/") if p and p != "." and p != ".."]
-        
-        if not path_parts:
-            continue
-        
-        # Build destination path preserving directory structure
-        destination = target_dir
-        for part in path_parts:
-            destination = destination / part
-        
-        destination = destination.resolve()
-        
-        # Ensure destination stays within base_path
-        if base_path not in destination.parents and destination != base_path:
-            continue
-        
-        try:
-            destination.parent.mkdir(parents=True, exist_ok=True)
-            
-            if not destination.exists():
-                if len(path_parts) > 1 or not file.filename.endswith("/"):
-                    fs.ensure_not_exists(destination)
-                    await fs.save_upload_file(destination, file)
-                    uploaded_count += 1
-        except Exception:
-            continue
-    
+        async with gate:
+            destination = await asyncio.to_thread(
+                _prepare_guest_destination, target_dir, base_path, relative_path, ensured_dirs
+            )
+            if destination is None:
+                return False
+            try:
+                # save_upload_file opens exclusively, so existing files 409
+                await fs.save_upload_file(destination, file)
+            except Exception:
+                # Skip files that can't be uploaded
+                return False
+            return True
+
+    results = await asyncio.gather(*(_upload_one(file) for file in files))
+    uploaded_count = sum(results)
+
+    _clear_tree_caches()
     return OperationResult(detail=f"{uploaded_count} file(s) uploaded")
 
 
 @app.post("/api/open/{share_id}/mkdir", response_model=OperationResult)
 def make_shared_directory(
-    share_id: str,
     payload: MkdirPayload,
+    ctx: GuestContext = Depends(guest_ctx_write),
 ):
     """Create a directory in a shared resource (requires write permission)."""
-    share = get_share_for_guest(share_id)
-    check_guest_write_permission(share)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    base_path = ctx.base_path
     
     # If base path is a file, can't create directory
     if base_path.is_file():
@@ -1016,32 +1464,26 @@ def make_shared_directory(
     fs.ensure_directory(parent)
     
     name = payload.name.strip()
-    name_path = Path(name)
-    if name == "" or name_path.is_absolute() or ".." in name_path.parts or name_path.name != name:
+    if not _VALID_NAME.fullmatch(name):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid directory name")
     
-    target = (parent / name_path).resolve()
-    
-    # Ensure target stays within base_path
-    if base_path not in target.parents and target != base_path:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination")
+    # Validated leaf under an already-resolved parent: skip the resolve()
+    # path walk and containment re-check
+    target = parent / name
     
     fs.ensure_not_exists(target)
     target.mkdir(parents=False, exist_ok=False)
+    _clear_tree_caches()
     return OperationResult(detail="Directory created")
 
 
 @app.post("/api/open/{share_id}/create-file", response_model=OperationResult)
 def create_shared_file(
-    share_id: str,
     payload: CreateFilePayload,
+    ctx: GuestContext = Depends(guest_ctx_write),
 ):
     """Create an empty file in a shared resource (requires write permission)."""
-    share = get_share_for_guest(share_id)
-    check_guest_write_permission(share)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    base_path = ctx.base_path
     
     # If base path is a file, can't create file
     if base_path.is_file():
@@ -1056,29 +1498,23 @@ def create_shared_file(
     fs.ensure_directory(parent)
     
     name = payload.name.strip()
-    name_path = Path(name)
-    if name == "" or name_path.is_absolute() or ".." in name_path.parts or name_path.name != name:
+    if not _VALID_NAME.fullmatch(name):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid filename")
     
-    target = (parent / name_path).resolve()
-    
-    # Ensure target stays within base_path
-    if base_path not in target.parents and target != base_path:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination")
+    # Validated leaf under an already-resolved parent: skip the resolve()
+    # path walk and containment re-check
+    target = parent / name
     
     fs.ensure_not_exists(target)
     target.touch(exist_ok=False)
+    _clear_tree_caches()
     return OperationResult(detail="File created")
 
 
 @app.delete("/api/open/{share_id}/delete", response_model=OperationResult)
-def delete_shared_path(share_id: str, path: str):
+def delete_shared_path(path: str, ctx: GuestContext = Depends(guest_ctx_write)):
     """Delete a file or folder from a shared resource (requires write permission)."""
-    share = get_share_for_guest(share_id)
-    check_guest_write_permission(share)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    base_path = ctx.base_path
     
     # Resolve the target path within the shared base
     target = resolve_guest_path(path, base_path)
@@ -1087,22 +1523,19 @@ def delete_shared_path(share_id: str, path: str):
     if target == base_path:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot delete the shared root")
     
-    # Ensure target is within base_path
-    if base_path not in target.parents:
+    # Ensure target is within base_path (equality was rejected above)
+    if not _is_within(base_path, target):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid path")
     
     fs.remove_path(target)
+    _clear_tree_caches()
     return OperationResult(detail="Deleted")
 
 
 @app.post("/api/open/{share_id}/move", response_model=OperationResult)
-def move_shared_path(share_id: str, payload: MovePayload):
+def move_shared_path(payload: MovePayload, ctx: GuestContext = Depends(guest_ctx_write)):
     """Move a file or folder within a shared resource (requires write permission)."""
-    share = get_share_for_guest(share_id)
-    check_guest_write_permission(share)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    base_path = ctx.base_path
     
     # Resolve source and destination within the shared base
     src = resolve_guest_path(payload.src, base_path)
@@ -1113,9 +1546,9 @@ def move_shared_path(share_id: str, payload: MovePayload):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot move the shared root")
     
     # Ensure both paths are within base_path
-    if base_path not in src.parents and src != base_path:
+    if not _is_within(base_path, src):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid source path")
-    if base_path not in dst.parents and dst != base_path:
+    if not _is_within(base_path, dst):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination path")
     
     if not src.exists():
@@ -1126,19 +1559,16 @@ def move_shared_path(share_id: str, payload: MovePayload):
     if not dst.parent.is_dir():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Destination parent is not a directory")
     
-    fs.ensure_not_exists(dst)
+    # move_path handles the no-overwrite check atomically
     fs.move_path(src, dst)
+    _clear_tree_caches()
     return OperationResult(detail="Moved")
 
 
 @app.post("/api/open/{share_id}/copy", response_model=OperationResult)
-def copy_shared_path(share_id: str, payload: CopyPayload):
+def copy_shared_path(payload: CopyPayload, ctx: GuestContext = Depends(guest_ctx_write)):
     """Copy a file or folder within a shared resource (requires write permission)."""
-    share = get_share_for_guest(share_id)
-    check_guest_write_permission(share)
-    
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
+    base_path = ctx.base_path
     
     # Resolve source and destination within the shared base
     src = resolve_guest_path(payload.src, base_path)
@@ -1149,9 +1579,9 @@ def copy_shared_path(share_id: str, payload: CopyPayload):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot copy the shared root")
     
     # Ensure both paths are within base_path
-    if base_path not in src.parents and src != base_path:
+    if not _is_within(base_path, src):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid source path")
-    if base_path not in dst.parents and dst != base_path:
+    if not _is_within(base_path, dst):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid destination path")
     
     if not src.exists():
@@ -1164,97 +1594,78 @@ def copy_shared_path(share_id: str, payload: CopyPayload):
     
     fs.ensure_not_exists(dst)
     fs.copy_path(src, dst)
+    _clear_tree_caches()
     return OperationResult(detail="Copied")
 
 
 @app.post("/api/open/{share_id}/download-zip")
-def download_shared_as_zip(share_id: str, payload: DownloadPayload):
+def download_shared_as_zip(payload: DownloadPayload, ctx: GuestContext = Depends(guest_ctx)):
     """Download multiple files/folders from a shared resource as a zip archive."""
-    share = get_share_for_guest(share_id)
-    
     if not payload.paths:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No paths provided")
     
-    # Resolve the base path from the share
-    base_path = resolve_path(share.path, share.username)
-    
-    # Create a temporary zip file
-    temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
-    temp_zip_path = Path(temp_zip.name)
-    temp_zip.close()
-    
-    try:
-        with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for path_str in payload.paths:
-                resolved_path = resolve_guest_path(path_str, base_path)
-                if not resolved_path.exists():
-                    continue
-                
-                # Ensure path is within base_path
-                if base_path not in resolved_path.parents and resolved_path != base_path:
-                    continue
-                
-                # Get the base name for the archive
-                if resolved_path.is_file():
-                    zip_file.write(resolved_path, resolved_path.name)
-                elif resolved_path.is_dir():
-                    # Add directory and all its contents
-                    add_to_zip(zip_file, resolved_path, resolved_path, resolved_path.name)
-        
-        # Determine zip filename
-        if len(payload.paths) == 1:
-            single_path = resolve_guest_path(payload.paths[0], base_path)
-            zip_filename = f"{single_path.name}.zip"
-        else:
-            zip_filename = "download.zip"
-        
-        # Use StreamingResponse to allow cleanup after download
-        def generate():
-            with open(temp_zip_path, 'rb') as f:
-                while True:
-                    chunk = f.read(8192)
-                    if not chunk:
-                        break
-                    yield chunk
-            # Clean up after streaming
-            if temp_zip_path.exists():
-                temp_zip_path.unlink()
-        
-        return StreamingResponse(
-            generate(),
-            media_type="application/zip",
-            headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
+    base_path = ctx.base_path
+
+    # Resolve each requested path exactly once; resolve_guest_path already
+    # rejects escapes, and the belt-and-braces containment filter from the
+    # temp-file version stays in place
+    resolved = _dedupe_nested(
+        resolved_path
+        for resolved_path in (
+            resolve_guest_path(path_str, base_path) for path_str in payload.paths
         )
-    except Exception as e:
-        # Clean up temp file on error
-        if temp_zip_path.exists():
-            temp_zip_path.unlink()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        if _is_within(base_path, resolved_path)
+    )
+    zs = build_zip_stream(resolved)
+
+    # Determine zip filename from the already-resolved list
+    if len(resolved) == 1:
+        zip_filename = f"{resolved[0].name}.zip"
+    else:
+        zip_filename = "download.zip"
+
+    return StreamingResponse(
+        stream_zip(zs),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
+    )
 
 
-# SPA routing catch-all - serve index.html for all non-API routes
+# SPA routing catch-all - serve cached assets or index.html for non-API routes
 # This must be registered AFTER all API routes but handles routes like /shared, /private, etc.
 @app.get("/{full_path:path}")
-async def serve_spa(full_path: str):
+async def serve_spa(full_path: str, request: Request):
     """
-    Serve static files or index.html for SPA routing.
+    Serve static files or index.html for SPA routing, from the in-memory cache.
     This ensures that routes like /shared, /private, etc. work on page reload.
     """
     # Don't interfere with API routes (they're registered before this)
     if full_path.startswith("api/"):
         raise HTTPException(status_code=404, detail="Not Found")
-    
-    # Try to serve the requested file if it exists (for assets, favicon, etc.)
-    static_file_path = STATIC_DIR / full_path
-    if static_file_path.exists() and static_file_path.is_file():
-        return FileResponse(static_file_path)
-    
-    # For all other routes (like /shared, /private, /shared/folder, etc.), serve index.html
-    index_path = STATIC_DIR / "index.html"
-    if index_path.exists():
-        return FileResponse(index_path)
-    
-    raise HTTPException(status_code=404, detail="Not Found")
 
-# Note: We're not using app.mount for static files anymore since we handle it manually above
-# This gives us better control over SPA routing
+    # Assets come from the cache; anything else falls through to index.html
+    # so SPA routes (/shared, /private/folder, ...) work on page reload
+    is_asset = full_path in _STATIC_CACHE
+    entry = _STATIC_CACHE[full_path] if is_asset else _STATIC_CACHE.get("index.html")
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    body, br_body, gz_body, etag, ctype = entry
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED)
+
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if is_asset and full_path.startswith("assets/"):
+        # Vite emits content-hashed asset names, so these never change
+        headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        headers["Cache-Control"] = "no-cache"
+
+    accept_encoding = request.headers.get("accept-encoding", "")
+    if br_body is not None and "br" in accept_encoding:
+        headers["Content-Encoding"] = "br"
+        body = br_body
+    elif gz_body is not None and "gzip" in accept_encoding:
+        headers["Content-Encoding"] = "gzip"
+        body = gz_body
+    return Response(content=body, media_type=ctype, headers=headers)
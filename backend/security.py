@@ -1,3 +1,5 @@
+import os
+from functools import lru_cache
 from pathlib import Path
 
 from fastapi import HTTPException, status
@@ -7,8 +9,10 @@ ROOT_DIR = Path("/srv/files").resolve()
 SHARED_DIR = ROOT_DIR / "shared"
 USERS_DIR = ROOT_DIR / "users"
 
-# Users allowed to write to shared folder
-SHARED_WRITE_USERS = {"Aharon", "Amit", "Yuval"}
+# Users allowed to write to shared folder. Frozen: the roster never changes
+# at runtime, and a frozenset skips GC tracking on a per-request membership
+# test (mirrors USERNAMES in auth.py).
+SHARED_WRITE_USERS = frozenset({"Aharon", "Amit", "Yuval"})
 
 
 def _reject(detail: str, status_code: int = status.HTTP_400_BAD_REQUEST) -> None:
@@ -16,15 +20,23 @@ def _reject(detail: str, status_code: int = status.HTTP_400_BAD_REQUEST) -> None
     raise HTTPException(status_code=status_code, detail=detail)
 
 
+@lru_cache(maxsize=4096)
 def resolve_path(user_path: str | None, username: str | None = None) -> Path:
     """
     Resolve a user-supplied path that may start with /shared/ or /private/.
-    
+
     Paths starting with /shared/ map to ROOT_DIR/shared/
     Paths starting with /private/ map to ROOT_DIR/users/<username>/
     Other paths are treated as relative to the appropriate storage based on context.
-    
+
     The result is guaranteed to stay within the appropriate directory.
+
+    Results are cached per (path, username): resolution is a pure function of
+    its inputs apart from symlink expansion, so mutating endpoints clear the
+    cache after renames/deletes to avoid stale symlink resolutions. Create-type
+    endpoints (mkdir, uploads, create-file) deliberately do not clear it -
+    adding a regular file or directory cannot change how any string resolves,
+    since no endpoint creates symlinks.
     """
     if user_path is None:
         user_path = ""
@@ -39,54 +51,56 @@ def resolve_path(user_path: str | None, username: str | None = None) -> Path:
     if user_path.startswith("/"):
         user_path = user_path[1:]
     
-    # Determine base directory based on path prefix
-    if user_path == "shared" or user_path.startswith("shared/"):
+    # One split decides the storage: everything before the first "/" is the
+    # prefix, the rest is the relative path - no repeated startswith scans
+    # or magic slice offsets.
+    head, _, rest = user_path.partition("/")
+    if head == "shared":
         base_dir = SHARED_DIR
-        # Remove "shared" or "shared/" prefix
-        if user_path == "shared":
-            relative_path = ""
-        else:
-            relative_path = user_path[7:]  # len("shared/") = 7
-    elif user_path == "private" or user_path.startswith("private/"):
+        relative_path = rest
+    elif head == "private":
         if not username:
             _reject("Username required for private storage")
         base_dir = USERS_DIR / username
-        # Remove "private" or "private/" prefix
-        if user_path == "private":
+        relative_path = rest
+        # The hierarchy API hands back paths relative to ROOT_DIR; strip the
+        # redundant "users/<username>" prefix when present.
+        users_prefix = f"users/{username}"
+        if relative_path == users_prefix:
             relative_path = ""
         else:
-            relative_path = user_path[8:]  # len("private/") = 8
-            # If path already contains "users/username", remove that prefix too
-            # This handles paths from hierarchy API that are relative to ROOT_DIR
-            users_prefix = f"users/{username}/"
-            if relative_path.startswith(users_prefix):
-                relative_path = relative_path[len(users_prefix):]
-            elif relative_path == f"users/{username}":
-                relative_path = ""
+            # removeprefix returns the string unchanged when the prefix is
+            # absent - one C call instead of a startswith + slice pair.
+            relative_path = relative_path.removeprefix(users_prefix + "/")
     else:
         # Default to shared if no prefix (for backward compatibility)
         base_dir = SHARED_DIR
         relative_path = user_path
 
     # Handle empty path (root of storage)
-    if not relative_path or relative_path == "":
+    if not relative_path:
         return base_dir
 
-    relative = Path(relative_path)
-
-    if relative.is_absolute():
+    if relative_path.startswith("/"):
         _reject("Absolute paths are not allowed")
 
-    if any(part == ".." for part in relative.parts):
+    # Traversal check as one substring scan: padding with slashes makes a
+    # ".." component match "/../" wherever it sits, with no Path object or
+    # .parts walk. Separators were already normalized to "/" above.
+    if "/../" in f"/{relative_path}/":
         _reject("Parent path traversal is not allowed")
 
-    candidate = (base_dir / relative).resolve()
+    base_str = str(base_dir)
+    resolved = os.path.realpath(os.path.join(base_str, relative_path))
 
-    # Ensure candidate stays within base_dir
-    if candidate != base_dir and base_dir not in candidate.parents:
+    # Containment as a single string-prefix test on the canonical path.
+    # realpath still expands symlinks, so escapes through links are caught;
+    # what goes away is Path.resolve()'s object churn and the allocation of
+    # every ancestor in candidate.parents just to test membership.
+    if resolved != base_str and not resolved.startswith(base_str + os.sep):
         _reject("Path escapes storage directory")
 
-    return candidate
+    return Path(resolved)
 
 
 def resolve_guest_path(user_path: str | None, share_base_path: Path) -> Path:
@@ -103,9 +117,11 @@ def resolve_guest_path(user_path: str | None, share_base_path: Path) -> Path:
     Returns:
         The resolved path, guaranteed to be within share_base_path
     """
-    if user_path is None:
-        user_path = ""
-    
+    # Browsing the share root is the most common guest call; answer it
+    # before any parsing or the is_file stat below.
+    if not user_path:
+        return share_base_path
+
     if "\x00" in user_path:
         _reject("Invalid path")
     
@@ -126,28 +142,33 @@ def resolve_guest_path(user_path: str | None, share_base_path: Path) -> Path:
     if not user_path or user_path == "":
         return share_base_path
     
-    relative = Path(user_path)
-    
-    if relative.is_absolute():
+    if user_path.startswith("/"):
         _reject("Absolute paths are not allowed")
-    
-    if any(part == ".." for part in relative.parts):
+
+    if "/../" in f"/{user_path}/":
         _reject("Parent path traversal is not allowed")
-    
-    candidate = (share_base_path / relative).resolve()
-    
-    # Ensure candidate stays within share_base_path
-    # This prevents access to files outside the shared directory
-    if share_base_path not in candidate.parents and candidate != share_base_path:
+
+    # Same string-based canonicalize-and-prefix-check as resolve_path: the
+    # share base is already canonical (it came out of resolve_path), so one
+    # realpath plus a startswith replaces the .parents membership walk while
+    # still catching symlink escapes.
+    base_str = str(share_base_path)
+    resolved = os.path.realpath(os.path.join(base_str, user_path))
+    if resolved != base_str and not resolved.startswith(base_str + os.sep):
         _reject("Path escapes shared directory")
-    
-    return candidate
+
+    return Path(resolved)
+
+
+# Built once: the rejection never varies, and FastAPI only reads the raised
+# instance, so reusing it skips an HTTPException construction per refusal.
+_NO_SHARED_WRITE = HTTPException(
+    status_code=status.HTTP_403_FORBIDDEN,
+    detail="You do not have permission to write to shared storage",
+)
 
 
 def check_shared_write_permission(username: str) -> None:
     """Check if user has permission to write to shared folder."""
     if username not in SHARED_WRITE_USERS:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to write to shared storage",
-        )
+        raise _NO_SHARED_WRITE
@@ -1,54 +1,166 @@
-import json
+import os
 import secrets
 import string
-from datetime import datetime
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
+
+import orjson
 
 from models import ShareInfo
 
-# File to store shares data
+# File to store shares data, plus the previous generation kept for recovery
 SHARES_FILE = Path(__file__).parent / "shares.json"
+BACKUP_FILE = SHARES_FILE.with_suffix('.json.bak')
+
+# Parsed-file cache: every share lookup goes through load_shares, but the
+# file only changes via save_shares below (or a hand edit). Keying the cache
+# on (mtime_ns, size) turns the steady-state read into one stat plus a dict
+# return instead of a full parse + per-entry model build, while still
+# noticing out-of-band edits to the file.
+_MISSING_STAMP = (-1, -1)  # stands in for "file does not exist"
+_cache_lock = threading.RLock()
+_write_lock = threading.Lock()  # serializes the persist sequence in save_shares
+_cached_shares: Optional[Dict[str, ShareInfo]] = None
+_cached_stamp: Optional[Tuple[int, int]] = None
+
+# Owner index over the cached dict, so list_user_shares jumps straight to a
+# user's bucket instead of scanning every share. Shared-storage shares are
+# visible to all users, so they bucket under a None username. Rebuilt in the
+# same places the cache itself is installed - cheap next to the parse.
+_cached_index: Dict[Tuple[str, Optional[str]], list] = {}
+
+
+def _build_index(shares: Dict[str, ShareInfo]) -> Dict[Tuple[str, Optional[str]], list]:
+    index: Dict[Tuple[str, Optional[str]], list] = {}
+    for share in shares.values():
+        owner = share.username if share.storage_type == 'private' else None
+        index.setdefault((share.storage_type, owner), []).append(share)
+    return index
+
+
+def _file_stamp() -> Tuple[int, int]:
+    try:
+        st = os.stat(SHARES_FILE)
+    except FileNotFoundError:
+        return _MISSING_STAMP
+    return (st.st_mtime_ns, st.st_size)
+
+
+# Lowercase letters and digits for share IDs
+_ID_ALPHABET = string.ascii_lowercase + string.digits
+_ID_RNG = secrets.SystemRandom()
 
 
 def generate_share_id() -> str:
     """Generate a unique 7-character alphanumeric share ID."""
-    # Use lowercase letters and digits
-    alphabet = string.ascii_lowercase + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(7))
+    # One choices() call draws all seven characters in a single C-level pass,
+    # where the old per-character secrets.choice comprehension paid a Python
+    # call each. SystemRandom keeps the same os.urandom entropy source.
+    return ''.join(_ID_RNG.choices(_ID_ALPHABET, k=7))
+
+
+def _parse_shares(raw: bytes) -> Dict[str, ShareInfo]:
+    # Everything in this file was validated by ShareInfo when the share was
+    # created, so rebuild models with model_construct and skip re-validating
+    # every field on every cache miss.
+    return {
+        share_id: ShareInfo.model_construct(**share_data)
+        for share_id, share_data in orjson.loads(raw).items()
+    }
 
 
 def load_shares() -> Dict[str, ShareInfo]:
-    """Load shares from JSON file."""
-    if not SHARES_FILE.exists():
-        return {}
-    
-    try:
-        with open(SHARES_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            # Convert dict to ShareInfo objects
-            shares = {}
-            for share_id, share_data in data.items():
-                shares[share_id] = ShareInfo(**share_data)
-            return shares
-    except (json.JSONDecodeError, KeyError, TypeError) as e:
-        # If file is corrupted, return empty dict
-        print(f"Error loading shares: {e}")
-        return {}
+    """Load shares from JSON file, served from cache while the file is unchanged.
+
+    Always returns a fresh dict: callers mutate the result before handing it
+    back to save_shares, and handing out the cached dict itself would let two
+    threadpool handlers mutate it concurrently (and mid-serialization).
+    """
+    global _cached_shares, _cached_stamp, _cached_index
+    stamp = _file_stamp()
+    with _cache_lock:
+        if _cached_shares is not None and _cached_stamp == stamp:
+            return dict(_cached_shares)
+
+    if stamp == _MISSING_STAMP:
+        shares: Dict[str, ShareInfo] = {}
+    else:
+        try:
+            shares = _parse_shares(SHARES_FILE.read_bytes())
+        except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+            # Corrupted main file (torn write, disk hiccup): fall back to the
+            # previous generation instead of silently dropping every share.
+            print(f"Error loading shares: {e}")
+            try:
+                shares = _parse_shares(BACKUP_FILE.read_bytes())
+                print("Recovered shares from backup")
+            except (OSError, orjson.JSONDecodeError, KeyError, TypeError):
+                shares = {}
+
+    with _cache_lock:
+        _cached_shares = shares
+        _cached_stamp = stamp
+        _cached_index = _build_index(shares)
+    return dict(shares)
 
 
 def save_shares(shares: Dict[str, ShareInfo]) -> None:
-    """Save shares to JSON file."""
-    # Convert ShareInfo objects to dicts
-    data = {}
-    for share_id, share_info in shares.items():
-        data[share_id] = share_info.model_dump() if hasattr(share_info, 'model_dump') else share_info.dict()
-    
-    # Write to file atomically
-    temp_file = SHARES_FILE.with_suffix('.json.tmp')
-    with open(temp_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
-    temp_file.replace(SHARES_FILE)
+    """Save shares to JSON file, dropping expired entries on the way out."""
+    # Piggybacked expiry sweep: reads no longer purge stale shares, so do it
+    # here where a full-file write is happening anyway.
+    now = int(time.time())
+    expired = [
+        share_id
+        for share_id, share in shares.items()
+        if share.expires_at is not None and now > share.expires_at
+    ]
+    for share_id in expired:
+        del shares[share_id]
+
+    # ShareInfo is flat, so __dict__ is already the serializable field dict -
+    # no model_dump walk per entry. orjson emits compact UTF-8 bytes in one
+    # pass; nothing human reads this file in the normal course.
+    payload = orjson.dumps(
+        {share_id: share_info.__dict__ for share_id, share_info in shares.items()}
+    )
+
+    # Write to file atomically and durably: fsync the tmp before the rename
+    # so a crash can't leave a zero-length file behind the new name, rotate
+    # the previous generation to .bak for recovery, then fsync the directory
+    # so both renames themselves survive a crash. The whole sequence runs
+    # under _write_lock - writers share the tmp name and the rotate is two
+    # renames, so interleaved savers would clobber each other's tmp and
+    # could drop the main file mid-rotation.
+    with _write_lock:
+        temp_file = SHARES_FILE.with_suffix('.json.tmp')
+        with open(temp_file, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        if SHARES_FILE.exists():
+            SHARES_FILE.replace(BACKUP_FILE)
+        temp_file.replace(SHARES_FILE)
+        dir_fd = os.open(SHARES_FILE.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+        # Adopt what we just persisted as the cache, stamped with the new
+        # file identity, so the writer's next read doesn't re-parse its own
+        # write. This must stay inside _write_lock: the stat has to pair with
+        # this writer's own rename, or a slower writer could stat a faster
+        # writer's file and pin its older dict under the newer stamp forever.
+        # Copied defensively: the caller still holds `shares`, and the cache
+        # must never alias a dict anyone else can mutate.
+        global _cached_shares, _cached_stamp, _cached_index
+        stamp = _file_stamp()
+        with _cache_lock:
+            _cached_shares = dict(shares)
+            _cached_stamp = stamp
+            _cached_index = _build_index(_cached_shares)
 
 
 def create_share(
@@ -75,7 +187,7 @@ def create_share(
         username=username,
         permissions=permissions,
         expires_at=expires_at,
-        created_at=int(datetime.now().timestamp())
+        created_at=int(time.time())
     )
     
     # Save to file
@@ -96,13 +208,14 @@ def get_share(share_id: str) -> Optional[ShareInfo]:
     
     # Check if share is expired
     if share.expires_at is not None:
-        current_time = int(datetime.now().timestamp())
+        current_time = int(time.time())
         if current_time > share.expires_at:
-            # Share expired, remove it
-            del shares[share_id]
-            save_shares(shares)
+            # Expired: just report absence. Rewriting the whole file from a
+            # read path turned every stale lookup into an O(N) disk write;
+            # the entry is dropped by the sweep in save_shares the next time
+            # something actually writes.
             return None
-    
+
     return share
 
 
@@ -129,26 +242,18 @@ def delete_share(share_id: str, username: str) -> bool:
 
 def list_user_shares(username: str, storage_type: str, path: Optional[str] = None) -> list[ShareInfo]:
     """List shares created by a user for a specific path or storage type."""
-    shares = load_shares()
-    current_time = int(datetime.now().timestamp())
-    
-    result = []
-    for share in shares.values():
-        # Filter expired shares
-        if share.expires_at is not None and current_time > share.expires_at:
-            continue
-        
-        # Filter by storage type and username
-        if share.storage_type != storage_type:
-            continue
-        
-        if storage_type == 'private' and share.username != username:
-            continue
-        
-        # Filter by path if specified
-        if path is not None and share.path != path:
-            continue
-        
-        result.append(share)
-    
-    return result
\ No newline at end of file
+    load_shares()  # refresh cache and index if the file changed
+
+    # The owner index has already done the storage_type/username filtering;
+    # only expiry and the optional path filter remain.
+    owner = username if storage_type == 'private' else None
+    with _cache_lock:
+        candidates = list(_cached_index.get((storage_type, owner), ()))
+
+    current_time = int(time.time())
+    return [
+        share
+        for share in candidates
+        if (share.expires_at is None or current_time <= share.expires_at)
+        and (path is None or share.path == path)
+    ]
\ No newline at end of file
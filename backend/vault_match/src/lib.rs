@@ -0,0 +1,38 @@
+//! Case-insensitive substring matching for search_files.
+//!
+//! Takes a directory's worth of entry names at once and returns the indices
+//! whose lowercased form contains the (already lowercased) needle, using
+//! memchr's SIMD substring search. Pure-ASCII names take a byte-level
+//! lowercasing fast path; anything else goes through str::to_lowercase.
+
+use memchr::memmem::Finder;
+use pyo3::prelude::*;
+
+#[pyfunction]
+fn find_matches(names: Vec<String>, needle: &str) -> Vec<usize> {
+    let needle_lower = needle.to_lowercase();
+    let finder = Finder::new(needle_lower.as_bytes());
+    let mut matches = Vec::new();
+    let mut buf: Vec<u8> = Vec::with_capacity(64);
+
+    for (index, name) in names.iter().enumerate() {
+        let bytes = name.as_bytes();
+        let found = if bytes.is_ascii() {
+            buf.clear();
+            buf.extend(bytes.iter().map(|b| b.to_ascii_lowercase()));
+            finder.find(&buf).is_some()
+        } else {
+            finder.find(name.to_lowercase().as_bytes()).is_some()
+        };
+        if found {
+            matches.push(index);
+        }
+    }
+    matches
+}
+
+#[pymodule]
+fn vault_match(m: &Bound<'_, PyModule>) -> PyResult<()> {
+    m.add_function(wrap_pyfunction!(find_matches, m)?)?;
+    Ok(())
+}
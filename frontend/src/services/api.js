@@ -1,13 +1,6 @@
 import axios from 'axios';
 
 // Helper functions for cookie management
-function setCookie(name, value, days = 3650) {
-  // Set cookie to expire in 10 years (effectively never expires)
-  const expires = new Date();
-  expires.setTime(expires.getTime() + days * 24 * 60 * 60 * 1000);
-  document.cookie = `${name}=${value};expires=${expires.toUTCString()};path=/;SameSite=Lax`;
-}
-
 function getCookie(name) {
   const nameEQ = name + '=';
   const ca = document.cookie.split(';');
@@ -29,30 +22,20 @@ const api = axios.create({
   withCredentials: true, // Enable cookies
 });
 
-// Add request interceptor to include JWT token in Authorization header
-api.interceptors.request.use(
-  (config) => {
-    const token = getCookie('jwt_token');
-    if (token) {
-      config.headers.Authorization = `Bearer ${token}`;
-    }
-    return config;
-  },
-  (error) => {
-    return Promise.reject(error);
-  }
-);
+// The JWT lives in the HttpOnly jwt_token cookie, which the browser attaches
+// automatically (withCredentials) - scripts never see it. Auth state is
+// tracked via the readable "authed" companion cookie the server sets at login.
 
 // Add response interceptor to handle 401 errors (unauthorized)
 api.interceptors.response.use(
   (response) => response,
   (error) => {
     if (error.response?.status === 401) {
-      // Token expired or invalid, clear cookie and redirect to login
+      // Token expired or invalid, clear auth state and redirect to login
       // But don't redirect if we're on a guest route (/open/)
       const isGuestRoute = window.location.pathname.startsWith('/open/');
       if (!isGuestRoute) {
-        deleteCookie('jwt_token');
+        deleteCookie('authed');
         if (window.location.pathname !== '/login') {
           window.location.href = '/login';
         }
@@ -63,24 +46,27 @@ api.interceptors.response.use(
 );
 
 export default {
-  // Login and store JWT token in cookie
+  // Login; the server sets the HttpOnly token cookie and the authed marker
   async login(username, password) {
     const response = await api.post('/login', { username, password });
-    const token = response.data.access_token;
-    setCookie('jwt_token', token);
     return response.data;
   },
 
-  // Logout (clear token)
-  logout() {
-    deleteCookie('jwt_token');
+  // Logout: have the server clear the HttpOnly token cookie, then drop the
+  // readable marker locally so the router flips even if the request failed
+  async logout() {
+    try {
+      await api.post('/logout');
+    } catch (error) {
+      // Best effort - clearing the marker below logs us out client-side
+    }
+    deleteCookie('authed');
   },
 
-  // Check if user is authenticated
-  // Checks if JWT token cookie exists (cookie is readable since httponly=false)
+  // Check if user is authenticated (readable marker set alongside the
+  // HttpOnly token cookie at login)
   isAuthenticated() {
-    const token = getCookie('jwt_token');
-    return token !== null && token !== undefined && token !== '';
+    return getCookie('authed') === '1';
   },
 
   // Get current username from token